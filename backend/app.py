@@ -5,21 +5,44 @@ Quran Reciter App
 """
 
 import os
+import re
 import time
-import tempfile
-import shutil
+import threading
 import random
 import requests
-import re
 import unicodedata
 import json
-from difflib import SequenceMatcher
-from flask import Flask, request, jsonify
+import uuid
+import hmac
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from pydub import AudioSegment
-from jiwer import wer
 from i18n.translations import get_translation, get_feedback_message, is_supported_language
 from data.surah_names import get_english_name
+from data.quran_corpus import QuranCorpus, clean_html_tags
+from data.normalize import normalize_text_for_compare
+from data.reference_index import ReferenceIndex
+from data.ngram_index import NgramIndex
+from audio.decode import load_audio, prepare_audio
+from audio.chunking import split_at_silence
+from scoring.alignment import align, align_words
+from scoring.char_alignment import char_errors_from_opcodes
+from scoring.word_analysis import word_analysis_from_opcodes, diff_html_from_opcodes, error_rate
+from scoring.ayah_ranges import score_ayahs, score_heard_ayahs
+from asr.scheduler import BatchingScheduler, transcribe_batch
+from asr.device import cuda_available
+from asr.warmup import warmup_clips, run_warmup
+from asr.profiles import load_profiles, decode_options, load_options, profile_key, DEFAULT_PROFILE
+from services.jobs import JobManager, JobQueueFull, COMPLETED, FAILED
+from services.streaming import StreamingSession, SessionStore, StreamLimitExceeded, TooManySessions, PCM_FORMATS
+from services.result_cache import ResultCache, hash_audio, MISS
+from services.quran_api import QuranApiClient
+from services.surah_cache import StaleWhileRevalidateCache
+from services.metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from services.profiler import SamplingProfiler, prune_profiles
+from services.admission import AdmissionController, AdmissionRejected
 
 # ------------- إعداد التطبيق -------------
 app = Flask(__name__)
@@ -29,6 +52,78 @@ CORS(app)  # Enable CORS for mobile app
 # حد حجم التحميل (10 ميجابايت)
 app.config["MAX_CONTENT_LENGTH"] = 10 * 1024 * 1024
 
+# ------------- المقاييس (Prometheus /metrics) -------------
+metrics = Registry()
+stage_latency = metrics.histogram(
+    "recitation_stage_seconds", "Time spent in each stage of a recitation evaluation", ("stage",)
+)
+evaluations_total = metrics.counter(
+    "recitation_evaluations_total", "Recitation evaluations by mode and outcome", ("mode", "outcome")
+)
+http_requests_total = metrics.counter(
+    "http_requests_total", "HTTP requests by endpoint, method and status", ("endpoint", "method", "status")
+)
+http_requests_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests being served")
+asr_backend_total = metrics.counter(
+    "asr_backend_evaluations_total", "Evaluations by ASR backend (faster-whisper or transformers fallback)", ("backend",)
+)
+asr_model_fallbacks_total = metrics.counter(
+    "asr_model_fallbacks_total", "Times the optimized model failed to load and a fallback model was used", ("model",)
+)
+metrics.gauge("asr_model_loaded", "1 once the ASR model is loaded", function=lambda: int(asr_model is not None))
+surah_list_source_total = metrics.counter(
+    "surah_list_source_total", "Surah list lookups by source (corpus, cache or built-in juz 30 fallback)", ("source",)
+)
+cache_lookups_total = metrics.counter(
+    "cache_lookups_total", "Result and transcription cache lookups by status", ("cache", "status")
+)
+metrics.counter("quran_api_requests_total", "Requests sent to the Quran API", function=lambda: quran_api.stats()["requests"])
+metrics.counter("quran_api_errors_total", "Failed Quran API requests", function=lambda: quran_api.stats()["errors"])
+metrics.counter(
+    "quran_api_short_circuited_total", "Quran API calls rejected by the open circuit breaker",
+    function=lambda: quran_api.stats()["short_circuited"],
+)
+metrics.gauge(
+    "quran_api_circuit_open", "1 while the Quran API circuit breaker is not closed",
+    function=lambda: int(quran_api.breaker.state != "closed"),
+)
+metrics.gauge(
+    "quran_api_latency_seconds_avg", "Average Quran API request latency", function=lambda: quran_api.stats()["avg_latency"]
+)
+
+
+@app.before_request
+def track_request_start():
+    http_requests_in_flight.inc()
+
+
+@app.after_request
+def track_request_status(response):
+    http_requests_total.inc(endpoint=request.endpoint or "unknown", method=request.method, status=response.status_code)
+    return response
+
+
+@app.teardown_request
+def track_request_end(exc=None):
+    http_requests_in_flight.dec()
+
+
+def record_evaluation_metrics(mode, result):
+    """Stage histograms, outcome and cache counters for one evaluation result."""
+    if "error" in result:
+        evaluations_total.inc(mode=mode, outcome="error")
+        return
+    evaluations_total.inc(mode=mode, outcome="success")
+    asr_backend_total.inc(backend="faster-whisper" if USE_FASTER_WHISPER else "transformers")
+    for stage, seconds in result.get("performance_breakdown", {}).items():
+        stage_latency.observe(seconds, stage=stage)
+    stage_latency.observe(result.get("processing_time", 0.0), stage="total")
+    for cache_name in ("result", "transcription"):
+        status = result.get(f"{cache_name}_cache")
+        if status:
+            cache_lookups_total.inc(cache=cache_name, status=status)
+
+
 # ------------- إعداد النموذج المحسّن بـ faster-whisper -------------
 # Use the optimized CTranslate2 model for 4x speed improvement
 MODEL_NAME = "OdyAsh/faster-whisper-base-ar-quran"
@@ -39,25 +134,177 @@ try:
     USE_FASTER_WHISPER = True
     print("✅ Using faster-whisper for OPTIMAL performance (4x faster!)")
 except ImportError:
-    from transformers import pipeline
+    # transformers (and torch) are imported only when the fallback model is actually loaded
     USE_FASTER_WHISPER = False
     print("⚠️ faster-whisper not available, using transformers (slower)")
 
-# Device configuration
-import torch
-gpu_available = torch.cuda.is_available()
+# Device configuration (CTranslate2 device count, no torch import)
+gpu_available = cuda_available()
 
-# Global model instance
+# Global model instance (loaded once per process, guarded by a lock for threaded servers)
 asr_model = None
+_asr_model_lock = threading.Lock()
+
+# Model lifecycle for the readiness endpoint: not_loaded -> loading -> warming_up -> ready (or failed);
+# "degraded" when the model loaded but its warmup failed or never settled (reason in degraded_reason),
+# until the background re-warmup (settle_warmup) settles it and moves it to ready
+model_status = {
+    "state": "not_loaded", "load_time": None, "warmup_time": None, "warmup": None, "fallback": None, "error": None,
+    "degraded_reason": None,
+}
+# Whether /api/ready accepts traffic on a degraded (loaded but not settled) model
+ASR_READY_WHEN_DEGRADED = os.environ.get("ASR_READY_WHEN_DEGRADED", "0") == "1"
+
+# Decode profiles (fast / balanced / accurate, plus any from ASR_DECODE_PROFILES_FILE): the default
+# profile sets how the model is loaded, requests can pick another one's decode settings
+DECODE_PROFILES, _file_default_profile = load_profiles(os.environ.get("ASR_DECODE_PROFILES_FILE"))
+DEFAULT_DECODE_PROFILE = os.environ.get("ASR_DECODE_PROFILE") or _file_default_profile or DEFAULT_PROFILE
+if DEFAULT_DECODE_PROFILE not in DECODE_PROFILES:
+    print(f"⚠️ Unknown decode profile {DEFAULT_DECODE_PROFILE!r}, using {DEFAULT_PROFILE!r}")
+    DEFAULT_DECODE_PROFILE = DEFAULT_PROFILE
+ASR_LOAD_OPTIONS = load_options(DECODE_PROFILES[DEFAULT_DECODE_PROFILE])
+
+# CTranslate2 threading: cpu_threads per transcription, num_workers parallel transcriptions
+# (explicitly set values override the default profile)
+ASR_CPU_THREADS = int(os.environ.get("ASR_CPU_THREADS", ASR_LOAD_OPTIONS["cpu_threads"]))
+ASR_NUM_WORKERS = int(os.environ.get("ASR_NUM_WORKERS", ASR_LOAD_OPTIONS["num_workers"]))
+
+# Reference-guided decoding: the expected ayah is the decoder prompt, so greedy search
+# is enough and the timestamp / temperature-fallback work scoring never uses is skipped
+DECODE_MODES = ("default", "guided")
+DEFAULT_DECODE_MODE = os.environ.get("DEFAULT_DECODE_MODE", "default")
+GUIDED_DECODE_OPTIONS = {
+    "beam_size": 1,
+    "best_of": 1,
+    "temperature": 0.0,
+    "without_timestamps": True,
+    "condition_on_previous_text": False,
+}
+
+# Micro-batching of concurrent requests (faster-whisper only)
+ASR_BATCHING = os.environ.get("ASR_BATCHING", "0") == "1"
+ASR_BATCH_MAX_SIZE = int(os.environ.get("ASR_BATCH_MAX_SIZE", "8"))
+ASR_BATCH_MAX_WAIT_MS = float(os.environ.get("ASR_BATCH_MAX_WAIT_MS", "10"))
+inference_scheduler = None
+if ASR_BATCHING:
+    inference_scheduler = BatchingScheduler(
+        lambda audios: transcribe_batch(
+            get_asr_pipeline(), audios, language="ar",
+            beam_size=DECODE_PROFILES[DEFAULT_DECODE_PROFILE]["beam_size"]
+        ),
+        max_batch_size=ASR_BATCH_MAX_SIZE,
+        max_wait_ms=ASR_BATCH_MAX_WAIT_MS,
+    )
+    print(f"📦 ASR micro-batching enabled (max_batch_size={ASR_BATCH_MAX_SIZE}, max_wait_ms={ASR_BATCH_MAX_WAIT_MS})")
+
+# Warmup: clip lengths (or a directory of bundled recordings), rounds and settle tolerance
+ASR_WARMUP_LENGTHS = [float(x) for x in os.environ.get("ASR_WARMUP_LENGTHS", "5,15,30").split(",") if x]
+ASR_WARMUP_CLIPS_DIR = os.environ.get("ASR_WARMUP_CLIPS_DIR") or None
+ASR_WARMUP_MAX_ROUNDS = int(os.environ.get("ASR_WARMUP_MAX_ROUNDS", "3"))
+ASR_WARMUP_TOLERANCE = float(os.environ.get("ASR_WARMUP_TOLERANCE", "0.2"))
+# Extra rounds a degraded model gets in the background before it is promoted anyway (0 = never)
+ASR_WARMUP_RETRY_ROUNDS = int(os.environ.get("ASR_WARMUP_RETRY_ROUNDS", "10"))
+
+
+def warm_up_model(model, previous=None, max_rounds=ASR_WARMUP_MAX_ROUNDS):
+    """
+    Run the warmup clips through the model's decode paths; returns the warmup latencies.
+    `previous` continues an earlier warmup result.
+    """
+    clips = warmup_clips(ASR_WARMUP_LENGTHS, ASR_WARMUP_CLIPS_DIR)
+    options = decode_options(DECODE_PROFILES[DEFAULT_DECODE_PROFILE])
+    steps = [
+        (name, lambda audio=audio: list(model.transcribe(audio, language="ar", **options)[0]))
+        for name, audio in clips
+    ]
+    shortest = min((audio for _, audio in clips), key=len)
+    steps.append((
+        "guided",
+        lambda: list(model.transcribe(
+            shortest, language="ar", initial_prompt="بِسْمِ اللَّهِ الرَّحْمَنِ الرَّحِيمِ",
+            **{**options, **GUIDED_DECODE_OPTIONS}
+        )[0]),
+    ))
+    if ASR_BATCHING:
+        for size in sorted({2, ASR_BATCH_MAX_SIZE}):
+            steps.append((f"batch_{size}", lambda size=size: transcribe_batch(
+                model, [shortest] * size, language="ar", beam_size=options["beam_size"]
+            )))
+    return run_warmup(steps, max_rounds=max_rounds, tolerance=ASR_WARMUP_TOLERANCE, previous=previous)
+
+
+def settle_warmup(model):
+    """
+    Keep warming a degraded model, one round at a time, until its latencies settle and
+    it is reported ready. If the extra rounds all run but never settle (a noisy shared
+    CPU), the model is promoted after ASR_WARMUP_RETRY_ROUNDS anyway: it works, its
+    latencies are just noisy. A warmup that still fails in the last round stays degraded.
+    """
+    warmup, error = model_status["warmup"], None
+    for _ in range(ASR_WARMUP_RETRY_ROUNDS):
+        try:
+            warmup, error = warm_up_model(model, previous=warmup, max_rounds=1), None
+        except Exception as e:
+            # Start over: a failed round leaves the latencies incomplete
+            warmup, error = None, e
+            continue
+        if warmup["settled"]:
+            break
+
+    if error is not None:
+        model_status["degraded_reason"] = f"warmup failed: {error}"
+        print(f"⚠️ Background warmup still failing after {ASR_WARMUP_RETRY_ROUNDS} rounds: {error}")
+        return
+    model_status.update(warmup=warmup, warmup_time=warmup["total_time"], degraded_reason=None, state="ready")
+    if warmup["settled"]:
+        print(f"🚀 Warmup settled after {warmup['rounds']} rounds, model ready")
+    else:
+        print(f"⚠️ Warmup latencies still not settled after {warmup['rounds']} rounds, model ready anyway")
+
 
 def get_asr_pipeline():
     """تحميل نموذج ASR محسّن بـ faster-whisper للحصول على أفضل أداء"""
+    # Double-checked locking: concurrent first requests load the model only once
+    if asr_model is None:
+        with _asr_model_lock:
+            if asr_model is None:
+                try:
+                    _load_asr_model()
+                except Exception as e:
+                    model_status.update(state="failed", error=str(e))
+                    raise
+    return asr_model
+
+
+def _load_transformers_pipeline(model_name, **kwargs):
+    """transformers fallback pipeline (torch + transformers: the optional requirements-transformers.txt)."""
+    try:
+        import torch
+        from transformers import pipeline
+    except ImportError as e:
+        raise RuntimeError(
+            f"transformers fallback unavailable ({e}): install faster-whisper, "
+            "or the optional extra with pip install -r requirements-transformers.txt"
+        ) from e
+    device = 0 if gpu_available else -1
+    return pipeline(
+        "automatic-speech-recognition",
+        model=model_name,
+        device=device,
+        torch_dtype=torch.float16 if gpu_available else torch.float32,
+        **kwargs
+    )
+
+
+def _load_asr_model():
+    """Load (and warm up) the ASR model into the global asr_model. Caller holds _asr_model_lock."""
     global asr_model, MODEL_NAME, USE_FASTER_WHISPER
     
     if asr_model is None:
         print(f"🚀 Loading OPTIMIZED ASR model: {MODEL_NAME}")
         device_info = 'GPU' if gpu_available else 'CPU'
         print(f"🎯 Device: {device_info}")
+        model_status.update(state="loading", error=None)
         
         start_time = time.time()
         
@@ -65,50 +312,56 @@ def get_asr_pipeline():
             if USE_FASTER_WHISPER:
                 # Use faster-whisper (CTranslate2) - Much faster!
                 device = "cuda" if gpu_available else "cpu"
-                compute_type = "float16" if gpu_available else "int8"  # Quantization for speed
+                # Quantization from the default decode profile (int8 unless configured otherwise)
+                compute_type = "float16" if gpu_available else ASR_LOAD_OPTIONS["compute_type"]
                 
-                print(f"🔥 Loading with faster-whisper (device={device}, compute_type={compute_type})")
-                asr_model = WhisperModel(
+                print(
+                    f"🔥 Loading with faster-whisper (device={device}, compute_type={compute_type}, "
+                    f"cpu_threads={ASR_CPU_THREADS}, num_workers={ASR_NUM_WORKERS}, "
+                    f"profile={DEFAULT_DECODE_PROFILE})"
+                )
+                model = WhisperModel(
                     MODEL_NAME,
                     device=device,
                     compute_type=compute_type,
+                    cpu_threads=ASR_CPU_THREADS,
+                    num_workers=ASR_NUM_WORKERS,
                     download_root=None,
                     local_files_only=False
                 )
                 
                 load_time = time.time() - start_time
                 print(f"✅ faster-whisper model loaded in {load_time:.2f} seconds")
+                model_status.update(state="warming_up", load_time=round(load_time, 2))
                 
-                # Model warmup with faster-whisper
+                # Model warmup with faster-whisper on recitation-length clips, through the
+                # default, guided and (when enabled) batched decode paths, until latencies settle
                 print("🔥 Warming up faster-whisper model...")
-                warmup_start = time.time()
                 try:
-                    import numpy as np
-                    # Create 1 second of silence for warmup
-                    dummy_audio = np.zeros(16000, dtype=np.float32)
-                    
-                    # Run warmup inference
-                    segments, info = asr_model.transcribe(dummy_audio, language="ar")
-                    list(segments)  # Consume the generator
-                    
-                    warmup_time = time.time() - warmup_start
-                    print(f"🚀 faster-whisper warmed up in {warmup_time:.2f} seconds!")
-                    print("💡 Model ready for BLAZING FAST inference!")
+                    model_status["warmup"] = warm_up_model(model)
+                    model_status["warmup_time"] = model_status["warmup"]["total_time"]
+                    if model_status["warmup"]["settled"]:
+                        print(f"🚀 faster-whisper warmed up in {model_status['warmup_time']:.2f} seconds!")
+                        print("💡 Model ready for BLAZING FAST inference!")
+                    else:
+                        model_status["degraded_reason"] = (
+                            f"warmup latencies did not settle within {ASR_WARMUP_MAX_ROUNDS} rounds"
+                        )
+                        print(f"⚠️ faster-whisper {model_status['degraded_reason']}")
                     
                 except Exception as e:
+                    model_status["degraded_reason"] = f"warmup failed: {e}"
                     print(f"⚠️ faster-whisper warmup failed: {e}")
+
+                # Publish only once fully loaded so other threads never see a half-ready model
+                asr_model = model
                 
             else:
                 # Fallback to transformers pipeline
-                device = 0 if gpu_available else -1
-                asr_model = pipeline(
-                    "automatic-speech-recognition",
-                    model="tarteel-ai/whisper-base-ar-quran",
-                    device=device,
-                    torch_dtype=torch.float16 if gpu_available else torch.float32
-                )
+                asr_model = _load_transformers_pipeline("tarteel-ai/whisper-base-ar-quran")
                 
                 load_time = time.time() - start_time
+                model_status["load_time"] = round(load_time, 2)
                 print(f"✅ Transformers pipeline loaded in {load_time:.2f} seconds")
                 
         except Exception as e:
@@ -118,26 +371,65 @@ def get_asr_pipeline():
             # Ultimate fallback
             if USE_FASTER_WHISPER:
                 try:
-                    asr_model = WhisperModel("base", device="cpu", compute_type="int8")
+                    asr_model = WhisperModel(
+                        "base", device="cpu", compute_type="int8",
+                        cpu_threads=ASR_CPU_THREADS, num_workers=ASR_NUM_WORKERS
+                    )
+                    asr_model_fallbacks_total.inc(model="faster-whisper-base")
+                    model_status["fallback"] = "faster-whisper-base"
                     print("✅ Fallback faster-whisper model loaded")
                 except:
                     USE_FASTER_WHISPER = False
             
             if not USE_FASTER_WHISPER:
-                device = 0 if gpu_available else -1
-                from transformers import pipeline
-                asr_model = pipeline("automatic-speech-recognition", model="openai/whisper-base", device=device)
+                asr_model = _load_transformers_pipeline("openai/whisper-base")
+                asr_model_fallbacks_total.inc(model="transformers-whisper-base")
+                model_status["fallback"] = "transformers-whisper-base"
                 print("✅ Ultimate fallback to transformers model loaded")
-    
-    return asr_model
 
-def transcribe_audio_optimized(audio_path):
-    """Transcribe audio using the optimized faster-whisper model"""
+        model_status["state"] = "degraded" if model_status["degraded_reason"] else "ready"
+        if model_status["state"] == "degraded" and ASR_WARMUP_RETRY_ROUNDS > 0:
+            threading.Thread(target=settle_warmup, args=(asr_model,), name="asr-rewarmup", daemon=True).start()
+
+
+def preload_asr_model():
+    """Load and warm up the model off the request path; failures are kept for /api/ready."""
+    try:
+        get_asr_pipeline()
+    except Exception as e:
+        print(f"❌ Background model load failed: {e}")
+
+
+# Fast startup: load + warm up the model on a background thread when the process starts,
+# so neither the import nor the first /api/check pays for it (ASR_PRELOAD=0 loads on first use)
+if os.environ.get("ASR_PRELOAD", "1") == "1":
+    threading.Thread(target=preload_asr_model, name="asr-preload", daemon=True).start()
+
+
+def transcribe_audio_optimized(audio, reference_text=None, decode_profile=None):
+    """
+    Transcribe a 16 kHz mono float32 array (or an audio file path) with the optimized model.
+    When `reference_text` is given, decode in the reference-guided fast mode.
+    `decode_profile` picks the decode settings (default: DEFAULT_DECODE_PROFILE).
+    """
     model = get_asr_pipeline()
+    guided = bool(reference_text) and USE_FASTER_WHISPER
+    decode_profile = decode_profile or DEFAULT_DECODE_PROFILE
     
+    if (USE_FASTER_WHISPER and inference_scheduler is not None and not guided and not isinstance(audio, str)
+            and decode_profile == DEFAULT_DECODE_PROFILE):
+        # Share one batched encoder/decoder pass with concurrent requests
+        return inference_scheduler.transcribe(audio)
+
     if USE_FASTER_WHISPER:
         # Use faster-whisper transcription (MUCH FASTER!)
-        segments, info = model.transcribe(audio_path, language="ar")
+        options = decode_options(DECODE_PROFILES[decode_profile])
+        if guided:
+            segments, info = model.transcribe(
+                audio, language="ar", initial_prompt=reference_text, **{**options, **GUIDED_DECODE_OPTIONS}
+            )
+        else:
+            segments, info = model.transcribe(audio, language="ar", **options)
         
         # Extract text from segments
         transcription = ""
@@ -149,80 +441,151 @@ def transcribe_audio_optimized(audio_path):
             "language": info.language,
             "language_probability": info.language_probability,
             "duration": info.duration,
-            "optimized": True
+            "optimized": True,
+            "decode_mode": "guided" if guided else "default",
+            "decode_profile": decode_profile
         }
     else:
         # Use transformers pipeline (fallback)
         import numpy as np
         import soundfile as sf
         
-        if isinstance(audio_path, str):
+        if isinstance(audio, str):
             # Load audio file as numpy array
-            audio, sample_rate = sf.read(audio_path)
+            audio, sample_rate = sf.read(audio)
             if sample_rate != 16000:
                 import librosa
                 audio = librosa.resample(audio, orig_sr=sample_rate, target_sr=16000)
-        else:
-            audio = audio_path
             
         result = model(audio)
-        return {"text": result["text"], "optimized": False}
+        return {"text": result["text"], "optimized": False, "decode_mode": "default"}
+
+# Long recitations: split at silences into <=30 s windows transcribed in parallel
+MAX_AUDIO_DURATION_S = int(os.environ.get("MAX_AUDIO_DURATION_S", "300"))
+# Range / whole-surah recitations run much longer than one ayah (Al-Mulk easily passes 5 minutes)
+RANGE_MAX_AUDIO_DURATION_S = int(os.environ.get("RANGE_MAX_AUDIO_DURATION_S", "1200"))
+# Windows only run side by side as far as the model can: CTranslate2 serves num_workers
+# transcriptions at once, the batch scheduler decodes up to ASR_BATCH_MAX_SIZE together
+LONG_AUDIO_WORKERS = int(os.environ.get(
+    "LONG_AUDIO_WORKERS", str(ASR_BATCH_MAX_SIZE if ASR_BATCHING else ASR_NUM_WORKERS)
+))
+# A single worker gains nothing from a pool: the windows are transcribed in the request thread
+_window_pool = (
+    ThreadPoolExecutor(max_workers=LONG_AUDIO_WORKERS, thread_name_prefix="asr-window")
+    if LONG_AUDIO_WORKERS > 1 else None
+)
+
+
+def transcribe_long_audio(audio, reference_text=None, decode_profile=None):
+    """
+    Transcribe audio of any length. Recordings longer than one Whisper window are
+    cut at the quietest points into windows of at most 30 s, the windows are
+    transcribed in parallel (or batched together by the scheduler) and the text
+    is stitched back in order.
+    Guided decoding only applies to a single window: faster-whisper keeps just the
+    last ~220 prompt tokens, so every window would be primed with the end of the
+    reference instead of its own part. Longer recordings are decoded in the default
+    mode and report decode_mode "default".
+    """
+    windows = split_at_silence(audio)
+    if len(windows) == 1:
+        return transcribe_audio_optimized(audio, reference_text, decode_profile)
 
-# ------------- إعدادات API للقرآن الكريم -------------
-API_BASE_URL = "https://api.quran.com/api/v4"
+    print(f"🧩 Long recitation ({len(audio) / 16000:.1f}s): {len(windows)} windows")
+    if reference_text:
+        print("ℹ️ Guided decoding skipped for a multi-window recitation, using the default mode")
+        reference_text = None
 
+    def transcribe(window):
+        return transcribe_audio_optimized(window, reference_text, decode_profile)
 
-# متغيرات تخزين مؤقت للسور (Cache)
-_cached_surahs = None
-_cache_timestamp = None
-CACHE_DURATION = 3600  # ساعة واحدة
+    results = list(_window_pool.map(transcribe, windows)) if _window_pool else [transcribe(w) for w in windows]
 
+    merged = dict(results[0])
+    merged["text"] = " ".join(r["text"].strip() for r in results if r["text"].strip())
+    merged["duration"] = len(audio) / 16000
+    merged["windows"] = len(windows)
+    return merged
 
-# ------------- وظائف API للقرآن الكريم -------------
-def clean_html_tags(text):
-    """إزالة علامات HTML من النص."""
-    clean_text = re.sub(r"<sup.*?</sup>", "", text)
-    clean_text = re.sub(r"<[^>]+>", "", clean_text)
-    return clean_text.strip()
 
+def transcribe_audio_words(audio):
+    """Transcribe with word timestamps; returns [(word, end_seconds), ...] for streaming."""
+    model = get_asr_pipeline()
 
-def get_all_surahs():
-    """جلب قائمة جميع السور من API مع نظام تخزين مؤقت."""
-    global _cached_surahs, _cache_timestamp
+    if USE_FASTER_WHISPER:
+        segments, info = model.transcribe(
+            audio, language="ar", word_timestamps=True, condition_on_previous_text=False
+        )
+        return [(w.word.strip(), w.end) for segment in segments for w in (segment.words or [])]
 
-    # فحص التخزين المؤقت
-    if _cached_surahs and _cache_timestamp:
-        if (time.time() - _cache_timestamp) < CACHE_DURATION:
-            return _cached_surahs, None
+    result = model(audio, return_timestamps="word")
+    return [
+        (chunk["text"].strip(), chunk["timestamp"][1] or 0.0)
+        for chunk in result.get("chunks", [])
+    ]
 
-    url = f"{API_BASE_URL}/chapters"
-    try:
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        chapters = response.json().get("chapters", [])
+# ------------- إعدادات API للقرآن الكريم -------------
+API_BASE_URL = os.environ.get("QURAN_API_BASE_URL", "https://api.quran.com/api/v4")
 
-        # تحويل البيانات إلى تنسيق مناسب مع الأسماء الإنجليزية
-        surahs = [(ch["id"], ch["name_arabic"], ch.get("name_simple", f"Surah {ch['id']}")) for ch in chapters]
+# عميل مشترك: اتصالات keep-alive، مهلات قصيرة، إعادة محاولة محدودة وقاطع دائرة
+quran_api = QuranApiClient(
+    API_BASE_URL,
+    connect_timeout=float(os.environ.get("QURAN_API_CONNECT_TIMEOUT", "3.05")),
+    read_timeout=float(os.environ.get("QURAN_API_READ_TIMEOUT", "5")),
+    retries=int(os.environ.get("QURAN_API_RETRIES", "2")),
+    failure_threshold=int(os.environ.get("QURAN_API_BREAKER_THRESHOLD", "5")),
+    reset_timeout=float(os.environ.get("QURAN_API_BREAKER_RESET_S", "30")),
+)
 
-        # حفظ في التخزين المؤقت
-        _cached_surahs = surahs
-        _cache_timestamp = time.time()
+# نسخة محلية من نص القرآن (تُبنى عبر: python -m data.quran_corpus sync)
+quran_corpus = QuranCorpus()
 
-        return surahs, None
+CACHE_DURATION = int(os.environ.get("SURAH_CACHE_TTL", "3600"))  # ساعة واحدة
 
-    except requests.exceptions.RequestException as e:
-        print(f"خطأ في جلب السور: {e}")
-        # في حالة الخطأ، ارجع للقائمة اليدوية لجزء عمّ مع أسماء إنجليزية
-        juz30_surahs = get_juz30_surahs_fallback()
-        # Add English names to the fallback data
-        enhanced_surahs = []
-        for surah_id, arabic_name in juz30_surahs:
-            english_name = get_english_name(surah_id)
-            enhanced_surahs.append((surah_id, arabic_name, english_name))
-        return (
-            enhanced_surahs,
-            f"تم استخدام القائمة المحلية بسبب خطأ في الشبكة: {e}",
-        )
+
+def fetch_surahs_from_api():
+    """جلب قائمة السور من API وتحويلها إلى (id, الاسم العربي, الاسم الإنجليزي)."""
+    chapters = quran_api.get_json("/chapters").get("chapters", [])
+    if not chapters:
+        raise ValueError("empty chapter list")
+    # تحويل البيانات إلى تنسيق مناسب مع الأسماء الإنجليزية
+    return [(ch["id"], ch["name_arabic"], ch.get("name_simple", f"Surah {ch['id']}")) for ch in chapters]
+
+
+# تخزين مؤقت للسور: تُعاد النسخة القديمة فورًا بينما يحدّثها خيط واحد في الخلفية،
+# وتُحفظ آخر نسخة سليمة على القرص
+surah_list_cache = StaleWhileRevalidateCache(
+    fetch_surahs_from_api,
+    ttl=CACHE_DURATION,
+    backoff=float(os.environ.get("SURAH_CACHE_BACKOFF_S", "5")),
+    max_backoff=float(os.environ.get("SURAH_CACHE_MAX_BACKOFF_S", "300")),
+    disk_path=os.environ.get("SURAH_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "surah_list.json")),
+    name="surah list",
+)
+
+
+# ------------- وظائف API للقرآن الكريم -------------
+def get_all_surahs():
+    """جلب قائمة جميع السور من المخزن المحلي أو من API مع نظام تخزين مؤقت."""
+    # المخزن المحلي أولاً - بدون أي اتصال بالشبكة
+    chapters = quran_corpus.get_chapters()
+    if chapters:
+        surah_list_source_total.inc(source="corpus")
+        return [(ch["id"], ch["name_arabic"], ch["name_simple"]) for ch in chapters], None
+
+    # التخزين المؤقت (قد تكون نسخة قديمة يجري تحديثها في الخلفية)
+    surahs, error = surah_list_cache.get()
+    if surahs is not None:
+        surah_list_source_total.inc(source="cache")
+        return [tuple(surah) for surah in surahs], None
+
+    surah_list_source_total.inc(source="fallback")
+    print(f"خطأ في جلب السور: {error}")
+    # في حالة الخطأ، ارجع للقائمة اليدوية لجزء عمّ مع أسماء إنجليزية
+    return (
+        get_juz30_surahs_fallback(),
+        f"تم استخدام القائمة المحلية بسبب خطأ في الشبكة: {error}",
+    )
 
 
 def get_juz30_surahs():
@@ -281,12 +644,12 @@ def get_juz30_surahs_fallback():
 
 def get_surah_verses(surah_id):
     """جلب آيات سورة معينة."""
-    url = f"{API_BASE_URL}/chapters/{surah_id}/verses"
+    verses = quran_corpus.get_verses(surah_id)
+    if verses:
+        return verses, None
+
     try:
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-        verses = data.get("verses", [])
+        verses = quran_api.get_json(f"/chapters/{surah_id}/verses").get("verses", [])
         return verses, None
     except requests.exceptions.RequestException as e:
         print(f"خطأ في جلب آيات السورة {surah_id}: {e}")
@@ -295,12 +658,9 @@ def get_surah_verses(surah_id):
 
 def get_ayah_from_quran_api(surah_id, ayah_number):
     """جلب نص آية معينة من API الرئيسي (Quran.com)."""
-    url = f"{API_BASE_URL}/verses/by_key/{surah_id}:{ayah_number}"
     params = {"fields": "text_imlaei"}
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data = quran_api.get_json(f"/verses/by_key/{surah_id}:{ayah_number}", params=params)
         verse = data.get("verse", {})
         text = verse.get("text_imlaei", "")
         return clean_html_tags(text)
@@ -311,7 +671,11 @@ def get_ayah_from_quran_api(surah_id, ayah_number):
 
 def get_ayah_text(surah_id, ayah_number):
     """جلب نص الآية مع نظام احتياطي متعدد."""
-    # أولاً: جرب API الرئيسي
+    # أولاً: المخزن المحلي
+    text = quran_corpus.get_ayah(surah_id, ayah_number)
+    if text:
+        return text
+    # ثانياً: جرب API الرئيسي
     text = get_ayah_from_quran_api(surah_id, ayah_number)
     if text:
         return text
@@ -327,155 +691,124 @@ def remove_diacritics(text):
     )
 
 
-def normalize_text_for_compare(text):
-    """تطبيع النص مع الاحتفاظ بالتشكيل للمقارنة الدقيقة"""
-    if not text:
-        return ""
+# فهرس النصوص المرجعية المطبّعة لكل الآيات (يُبنى مرة واحدة عند بدء التشغيل)
+_index_start = time.time()
+reference_index = ReferenceIndex.from_corpus(quran_corpus, normalize_text_for_compare)
+if len(reference_index):
+    print(
+        f"📚 Reference index: {len(reference_index)} ayahs, "
+        f"{len(reference_index.vocabulary)} tokens, "
+        f"{reference_index.memory_bytes() / 1024 / 1024:.1f} MB "
+        f"in {time.time() - _index_start:.2f}s"
+    )
+
+# فهرس n-gram للتعرف على الآيات المتلوة (يُبنى مسبقًا ويُفتح memory-mapped)
+ngram_index = NgramIndex()
+# Smallest fraction of the hypothesis n-grams a span must match to count as identified
+NGRAM_MIN_SCORE = float(os.environ.get("NGRAM_MIN_SCORE", "0.2"))
+if ngram_index.available:
+    print(f"🔎 N-gram index: {ngram_index.meta.get('ngrams', 0)} {ngram_index.meta.get('n')}-grams over {ngram_index.meta.get('ayahs', 0)} ayahs")
+
+
+def get_reference(surah_id, ayah_number, reference_raw):
+    """النص المرجعي المطبّع من الفهرس، أو تطبيعه مباشرة إذا لم تكن الآية مفهرسة."""
+    entry = reference_index.get(surah_id, ayah_number)
+    if entry is None:
+        entry = reference_index.entry_for_text(normalize_text_for_compare(reference_raw))
+    return entry
 
-    # لا نزيل التشكيل، فقط نزيل علامات الترقيم والأرقام
-    text = re.sub(
-        r"[^\w\s\u0600-\u06FF\u064B-\u065F\u0610-\u061A\u06D6-\u06ED]", "", text
-    )  # احتفظ بالحروف العربية والتشكيل
-    text = unicodedata.normalize("NFKC", text)  # تطبيع Unicode للتشكيل
-    return " ".join(text.split())  # تنظيف المسافات
+
+def get_reference_range(surah_id, ayah_start, ayah_end):
+    """
+    النصوص المرجعية لمدى من الآيات: قائمة (رقم الآية، النص الخام، مدخل الفهرس).
+    ترجع None إذا تعذر جلب أي آية من المدى.
+    """
+    ayahs = []
+    for ayah_number in range(ayah_start, ayah_end + 1):
+        reference_raw = get_ayah_text(surah_id, ayah_number)
+        if not reference_raw:
+            return None
+        ayahs.append((ayah_number, reference_raw, get_reference(surah_id, ayah_number, reference_raw)))
+    return ayahs
+
+
+def get_verses_count(surah_id):
+    """عدد آيات السورة من المخزن المحلي، أو من API كحل احتياطي."""
+    chapter = quran_corpus.get_chapter(surah_id)
+    if chapter:
+        return chapter["verses_count"]
+    verses, _ = get_surah_verses(surah_id)
+    return len(verses)
 
 
 def color_diff_html(ref_text, hyp_text):
     """
-    تلوين كلمة-بكلمة باستخدام opcodes من SequenceMatcher.
-    الكلمات المتطابقة تصبح باللون الأخضر، الكلمات المستبدلة بالأحمر،
-    الإدخالات بالبرتقالي، الحذوفات بخط مائل.
+    تلوين كلمة-بكلمة باستخدام محاذاة Levenshtein (أقل عدد من التعديلات).
     """
     ref_words = ref_text.split()
     hyp_words = hyp_text.split()
-    s = SequenceMatcher(None, ref_words, hyp_words)
-    parts = []
-    for tag, i1, i2, j1, j2 in s.get_opcodes():
-        if tag == "equal":
-            for w in ref_words[i1:i2]:
-                parts.append(f"<span class='word correct'>{w}</span>")
-        elif tag == "replace":
-            for w in hyp_words[j1:j2]:
-                parts.append(f"<span class='word wrong'>{w}</span>")
-        elif tag == "insert":
-            for w in hyp_words[j1:j2]:
-                parts.append(f"<span class='word insert'>{w}</span>")
-        elif tag == "delete":
-            for w in ref_words[i1:i2]:
-                parts.append(f"<span class='word deleted'>{w}</span>")
-    return " ".join(parts)
+    return diff_html_from_opcodes(align_words(ref_words, hyp_words), ref_words, hyp_words)
 
 
 def create_word_analysis(ref_text, hyp_text):
     """
     Create structured word-by-word analysis data for API consumption.
     Returns list of word objects with text and status.
+    Accepts either strings or already tokenized word lists.
     """
     if not ref_text or not hyp_text:
         return []
     
-    ref_words = ref_text.split()
-    hyp_words = hyp_text.split()
-    s = SequenceMatcher(None, ref_words, hyp_words)
-    analysis = []
-    
-    for tag, i1, i2, j1, j2 in s.get_opcodes():
-        if tag == "equal":
-            # Correct words
-            for w in ref_words[i1:i2]:
-                analysis.append({
-                    "text": w,
-                    "status": "correct",
-                    "type": "reference"
-                })
-        elif tag == "replace":
-            # Wrong words - show both reference and detected
-            for idx, w in enumerate(ref_words[i1:i2]):
-                analysis.append({
-                    "text": w,
-                    "status": "wrong",
-                    "type": "reference"
-                })
-            for idx, w in enumerate(hyp_words[j1:j2]):
-                analysis.append({
-                    "text": w,
-                    "status": "wrong",
-                    "type": "detected"
-                })
-        elif tag == "insert":
-            # Extra words (inserted by user)
-            for w in hyp_words[j1:j2]:
-                analysis.append({
-                    "text": w,
-                    "status": "insert",
-                    "type": "detected"
-                })
-        elif tag == "delete":
-            # Missing words (should have been said)
-            for w in ref_words[i1:i2]:
-                analysis.append({
-                    "text": w,
-                    "status": "missing",
-                    "type": "reference"
-                })
-    
-    return analysis
+    ref_words = ref_text.split() if isinstance(ref_text, str) else ref_text
+    hyp_words = hyp_text.split() if isinstance(hyp_text, str) else hyp_text
+    return word_analysis_from_opcodes(align_words(ref_words, hyp_words), ref_words, hyp_words)
+
 
+def align_with_reference(reference, hyp_words):
+    """Alignment opcodes of hypothesis words against a reference index entry, compared by token ID."""
+    ref_ids, hyp_ids = reference_index.vocabulary.encode_pair(reference.tokens, reference.token_ids, hyp_words)
+    return align(ref_ids, hyp_ids)
 
-def convert_to_wav(src_path):
+
+def score_hypothesis(hypothesis, reference, language="en", with_html=False, char_analysis=False):
     """
-    تحويل أي ملف صوتي وارد (webm/ogg/mp3) إلى WAV مونو 16kHz - محسّن للسرعة.
-    إرجاع مسار ملف WAV الجديد.
+    WER, feedback and word-by-word analysis of a transcription against a reference entry.
+    All of them come from a single alignment, so the statuses always add up to the WER.
+    With `char_analysis`, wrong words also carry letter/diacritic annotations.
     """
-    print(f"🎵 Converting audio: {os.path.basename(src_path)}")
-    convert_start = time.time()
-    
-    basename = os.path.splitext(os.path.basename(src_path))[0]
-    out_wav = os.path.join(tempfile.gettempdir(), f"{basename}_fast.wav")
-    
-    audio = AudioSegment.from_file(src_path)
-    
-    # Aggressive performance optimizations
-    audio = audio.set_channels(1)  # Mono for faster processing
-    audio = audio.set_frame_rate(16000)  # Whisper's optimal rate
-    audio = audio.set_sample_width(2)  # 16-bit for balance of quality/speed
-    
-    # Trim silence to reduce processing time
-    audio = audio.strip_silence(silence_len=100, silence_thresh=-50)
-    
-    # Limit audio length to 30 seconds (Whisper's max anyway)
-    if len(audio) > 30000:  # 30 seconds
-        print("⏰ Audio > 30s, trimming for faster processing")
-        audio = audio[:30000]
-    
-    # Fast export with minimal processing
-    audio.export(out_wav, format="wav", parameters=["-ac", "1", "-ar", "16000"])
-    
-    convert_time = time.time() - convert_start
-    print(f"✅ Audio converted in {convert_time:.2f}s")
-    
-    return out_wav
+    hyp_words = normalize_text_for_compare(hypothesis).split()
+    opcodes = align_with_reference(reference, hyp_words)
+    wer_score = error_rate(opcodes, len(reference.tokens))
+
+    scores = {
+        "wer_score": wer_score,
+        "accuracy_percentage": round(max(0.0, 1 - wer_score) * 100, 1),
+        # Get contextual feedback
+        "feedback": get_feedback_message(wer_score, language),
+        # Create word-by-word analysis
+        "word_analysis": word_analysis_from_opcodes(
+            opcodes, reference.tokens, hyp_words,
+            char_errors_from_opcodes(opcodes, reference.tokens, hyp_words) if char_analysis else None,
+        ) if hyp_words else [],
+    }
+    if with_html:
+        scores["colored_diff"] = diff_html_from_opcodes(opcodes, reference.tokens, hyp_words)
+    return scores
 
 
 # ------------- منطق تقييم التلاوة (محدّث) -------------
 def evaluate_recitation(file_path, surah_id, ayah_number):
     """
-    1) تحويل الملف إلى WAV إن لزم
+    1) فك ترميز الملف إلى مصفوفة صوتية في الذاكرة
     2) تشغيل ASR لإخراج النص
     3) جلب النص المرجعي من API
     4) مقارنة، حساب WER، تجهيز HTML ملون وإخراج رسالة تشجيع
     """
-    # تأكد من صلاحية المدخلات (أساسية)
-    try:
-        wav_path = convert_to_wav(file_path)
-    except Exception as e:
-        print("Audio convert error:", e)
-        # إذا التحويل فشل، جرّب إرسال الملف الأصلي مباشرة إلى الأنبوب
-        wav_path = file_path
+    with open(file_path, "rb") as f:
+        audio = load_audio(f.read(), MAX_AUDIO_DURATION_S)
 
     # 1) استدعاء نموذج التعرف على الكلام
-    asr_pipeline = get_asr_pipeline()
-    asr_result = asr_pipeline(wav_path)
+    asr_result = transcribe_long_audio(audio)
     hypothesis = asr_result.get("text", "").strip()
 
     # 2) نص المرجع من API
@@ -487,14 +820,11 @@ def evaluate_recitation(file_path, surah_id, ayah_number):
     ref_norm = normalize_text_for_compare(reference_raw)
     hyp_norm = normalize_text_for_compare(hypothesis)
 
-    # حساب WER باستخدام jiwer
-    try:
-        error = wer(ref_norm, hyp_norm)
-    except Exception:
-        error = 1.0
-
-    # 4) توليد HTML ملون
-    colored = color_diff_html(ref_norm, hyp_norm)
+    # حساب WER وتوليد HTML ملون من محاذاة واحدة
+    ref_words, hyp_words = ref_norm.split(), hyp_norm.split()
+    opcodes = align_words(ref_words, hyp_words)
+    error = error_rate(opcodes, len(ref_words))
+    colored = diff_html_from_opcodes(opcodes, ref_words, hyp_words)
 
     # 5)
     if error <= 0.10:
@@ -512,7 +842,6 @@ def evaluate_recitation(file_path, surah_id, ayah_number):
         "wer": error,
         "colored_html": colored,
         "feedback": feedback,
-        "wav_path": wav_path,
     }
 
 
@@ -535,11 +864,19 @@ def get_ayah_api():
 @app.route("/api/get_surah_info/<int:surah_id>", methods=["GET"])
 def get_surah_info(surah_id):
     """جلب معلومات السورة وعدد آياتها."""
-    url = f"{API_BASE_URL}/chapters/{surah_id}"
+    chapter = quran_corpus.get_chapter(surah_id)
+    if chapter:
+        return jsonify(
+            {
+                "id": chapter["id"],
+                "name_arabic": chapter["name_arabic"],
+                "verses_count": chapter["verses_count"],
+                "revelation_place": chapter["revelation_place"],
+            }
+        )
+
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data = quran_api.get_json(f"/chapters/{surah_id}")
         chapter = data.get("chapter", {})
         return jsonify(
             {
@@ -614,50 +951,253 @@ def health_check():
         "status": "healthy",
         "service": get_translation("service_name", language),
         "message": get_translation("service_healthy", language),
-        "supported_languages": ["en", "ar"]
+        "supported_languages": ["en", "ar"],
+        "decode_profiles": sorted(DECODE_PROFILES),
+        "default_decode_profile": DEFAULT_DECODE_PROFILE,
+        "quran_api": quran_api.stats(),
+        "admission": admission.stats() if admission else None,
+        "result_cache": result_cache.stats() if result_cache else None
     })
 
 
+@app.route("/ready")
+@app.route("/api/ready")
+def readiness_check():
+    """
+    Readiness: 200 only once the ASR model is loaded and its warmup latencies have settled
+    (a degraded model counts only with ASR_READY_WHEN_DEGRADED=1 until the background
+    re-warmup promotes it; liveness stays on /health).
+    """
+    status = dict(model_status)
+    ready = status["state"] == "ready" or (status["state"] == "degraded" and ASR_READY_WHEN_DEGRADED)
+    status.update(
+        ready=ready,
+        model=MODEL_NAME,
+        backend="faster-whisper" if USE_FASTER_WHISPER else "transformers",
+        device="cuda" if gpu_available else "cpu",
+    )
+    return jsonify(status), 200 if ready else 503
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint: stage latency histograms, counters and gauges."""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+def resolve_decode_profile(name):
+    """
+    The profile a request runs with. Unknown names, and profiles that differ from the
+    default only in load-time settings (which can't change per request), map to the
+    default profile so they share its cache entries and the batching scheduler.
+    """
+    if name not in DECODE_PROFILES:
+        return DEFAULT_DECODE_PROFILE
+    if decode_options(DECODE_PROFILES[name]) == decode_options(DECODE_PROFILES[DEFAULT_DECODE_PROFILE]):
+        return DEFAULT_DECODE_PROFILE
+    return name
+
+
+def parse_check_options():
+    """Evaluation options shared by /api/check, /api/check/jobs and /api/check_batch."""
+    # Get language preference
+    language = request.form.get('language', 'en')
+    if not is_supported_language(language):
+        language = 'en'
+
+    decode_mode = request.form.get('decode_mode', DEFAULT_DECODE_MODE)
+    if decode_mode not in DECODE_MODES:
+        decode_mode = DEFAULT_DECODE_MODE
+    decode_profile = resolve_decode_profile(request.form.get('decode_profile'))
+    return {
+        "language": language,
+        "decode_mode": decode_mode,
+        "decode_profile": decode_profile,
+        "compare_decoding": request.form.get('compare_decoding') == "1",
+        "char_analysis": request.form.get('char_analysis') == "1",
+    }
+
+
+def parse_check_form():
+    """
+    Validate the multipart form shared by /api/check and /api/check/jobs.
+    Returns (language, kwargs for evaluate_recitation_api, error response or None).
+    """
+    options = parse_check_options()
+    language = options["language"]
+    
+    # Validate input
+    audio_file = request.files.get('audio')
+    if not audio_file or audio_file.filename == "":
+        return language, None, (jsonify({
+            "error": get_translation("missing_audio", language)
+        }), 400)
+
+    # Identification mode: no surah given, the recited ayahs are looked up from the transcription
+    if ngram_index.available and (request.form.get('identify') == "1" or not request.form.get('surah_id')):
+        return language, {"audio_data": audio_file.read(), "identify": True, **options}, None
+
+    # Range mode: ayah_start/ayah_end, or whole_surah=1, in a single ASR pass
+    whole_surah = request.form.get('whole_surah') == "1"
+    range_mode = whole_surah or bool(request.form.get('ayah_start'))
+
+    try:
+        surah_id = int(request.form.get('surah_id'))
+        if range_mode:
+            ayah_start = 1 if whole_surah else int(request.form.get('ayah_start'))
+            ayah_end = None if whole_surah else int(request.form.get('ayah_end') or ayah_start)
+        else:
+            ayah_number = int(request.form.get('ayah_number'))
+    except (TypeError, ValueError):
+        return language, None, (jsonify({
+            "error": get_translation("missing_surah", language)
+        }), 400)
+
+    if range_mode:
+        ayah_fields = {"ayah_start": ayah_start, "ayah_end": ayah_end}
+    else:
+        ayah_fields = {"ayah_number": ayah_number}
+
+    # Evaluate recitation straight from the uploaded bytes (no temp files)
+    return language, {
+        "audio_data": audio_file.read(),
+        "surah_id": surah_id,
+        **ayah_fields,
+        **options,
+    }, None
+
+
+# ------------- التحليل عند الطلب (Profiling) -------------
+# Operator-only: with PROFILING_ENABLED=1 and a PROFILE_TOKEN, a request carrying
+# "X-Profile: <PROFILE_TOKEN>" is run under the sampling profiler. Saved profiles are
+# capped at PROFILE_MAX_FILES and expire after PROFILE_TTL_S.
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+if PROFILING_ENABLED and not PROFILE_TOKEN:
+    print("⚠️ PROFILING_ENABLED=1 without a PROFILE_TOKEN: profiling stays disabled")
+    PROFILING_ENABLED = False
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "recitation-profiles"))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "100"))
+PROFILE_TTL_S = int(os.environ.get("PROFILE_TTL_S", "86400"))
+
+
+def profile_requested():
+    requested = request.headers.get("X-Profile") or request.args.get("profile")
+    return bool(requested) and hmac.compare_digest(requested.encode("utf-8"), PROFILE_TOKEN.encode("utf-8"))
+
+
+def run_profiled(fn, **kwargs):
+    """Run `fn` under the sampling profiler and store its collapsed stacks under a new profile ID."""
+    # Always unique: a client's X-Request-ID only prefixes the ID, so it can't overwrite another profile
+    client_id = re.sub(r"[^A-Za-z0-9_-]", "", request.headers.get("X-Request-ID", ""))[:32]
+    request_id = f"{client_id}-{uuid.uuid4().hex}" if client_id else uuid.uuid4().hex
+    with SamplingProfiler(interval=PROFILE_INTERVAL_MS / 1000) as profiler:
+        result = fn(**kwargs)
+    path = profiler.save(PROFILE_DIR, request_id)
+    prune_profiles(PROFILE_DIR, PROFILE_MAX_FILES, PROFILE_TTL_S)
+    print(f"🔬 Profile {request_id}: {profiler.samples} samples over {profiler.duration:.2f}s -> {path}")
+    result["profile"] = {
+        "request_id": request_id,
+        "samples": profiler.samples,
+        "duration": round(profiler.duration, 3),
+        # Fetch URL only: the server's filesystem layout stays private
+        "url": f"/api/profiles/{request_id}",
+        "top_frames": [{"frame": frame, "samples": count} for frame, count in profiler.top_frames()],
+    }
+    return result
+
+
+@app.route("/api/profiles/<request_id>", methods=["GET"])
+def api_get_profile(request_id):
+    """Collapsed-stack profile of a profiled request (flamegraph.pl / speedscope input)."""
+    if not PROFILING_ENABLED or not profile_requested() or not re.fullmatch(r"[A-Za-z0-9_-]+", request_id):
+        return jsonify({"error": "not found"}), 404
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{request_id}.collapsed"), encoding="utf-8") as f:
+            return Response(f.read(), mimetype="text/plain")
+    except OSError:
+        return jsonify({"error": "not found"}), 404
+
+
+# ------------- التحكم في القبول (Admission control) -------------
+# Bounded queue in front of the synchronous evaluators: requests that can't finish
+# within the latency budget get a fast 503 + Retry-After (ADMISSION_MAX_CONCURRENCY=0 disables)
+ADMISSION_MAX_CONCURRENCY = int(os.environ.get(
+    "ADMISSION_MAX_CONCURRENCY", str(ASR_BATCH_MAX_SIZE if ASR_BATCHING else ASR_NUM_WORKERS)
+))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "8"))
+ADMISSION_LATENCY_BUDGET_S = float(os.environ.get("ADMISSION_LATENCY_BUDGET_S", "60"))
+admission = AdmissionController(
+    max_concurrency=ADMISSION_MAX_CONCURRENCY,
+    max_queue=ADMISSION_MAX_QUEUE,
+    latency_budget=ADMISSION_LATENCY_BUDGET_S,
+) if ADMISSION_MAX_CONCURRENCY > 0 else None
+admission_rejections_total = metrics.counter(
+    "admission_rejections_total", "Requests turned away by admission control", ("reason",)
+)
+metrics.gauge(
+    "admission_active", "Evaluations holding an admission slot",
+    function=lambda: admission.stats()["active"] if admission else 0,
+)
+metrics.gauge(
+    "admission_waiting", "Requests waiting in the admission queue",
+    function=lambda: admission.stats()["waiting"] if admission else 0,
+)
+
+
+def admitted(background=False):
+    """
+    Admission slot context (yields the queue wait in seconds); a no-op when disabled.
+    `background` work (async jobs) waits for a slot instead of being rejected.
+    """
+    return admission.admit(background) if admission is not None else nullcontext(0.0)
+
+
+def add_queue_wait(result, queue_wait):
+    """Report the admission queue wait as its own stage of an evaluation result."""
+    if "performance_breakdown" in result:
+        result["performance_breakdown"]["queue_wait"] = round(queue_wait, 3)
+        result["processing_time"] = round(result.get("processing_time", 0.0) + queue_wait, 2)
+    return result
+
+
+def rejection_result(rejection, language):
+    """Error body for a request (or batch item) admission control turned away."""
+    admission_rejections_total.inc(reason=rejection.reason)
+    print(f"🚦 Rejected by admission control ({rejection.reason}), retry after {rejection.retry_after}s")
+    return {
+        "error": get_translation("server_busy", language),
+        "reason": rejection.reason,
+        "retry_after": rejection.retry_after,
+    }
+
+
+def overloaded_response(rejection, language):
+    """Fast 503 for a request admission control turned away."""
+    response = jsonify(rejection_result(rejection, language))
+    response.headers["Retry-After"] = str(rejection.retry_after)
+    return response, 503
+
+
 @app.route("/api/check", methods=["POST"])
 def api_check_recitation():
     """API endpoint for mobile app recitation checking with language support."""
+    language = 'en'
     try:
-        # Get language preference
-        language = request.form.get('language', 'en')
-        if not is_supported_language(language):
-            language = 'en'
-        
-        # Validate input
-        audio_file = request.files.get('audio')
-        if not audio_file or audio_file.filename == "":
-            return jsonify({
-                "error": get_translation("missing_audio", language)
-            }), 400
+        language, params, error_response = parse_check_form()
+        if error_response:
+            return error_response
 
         try:
-            surah_id = int(request.form.get('surah_id'))
-            ayah_number = int(request.form.get('ayah_number'))
-        except (TypeError, ValueError):
-            return jsonify({
-                "error": get_translation("missing_surah", language)
-            }), 400
-
-        # Process the audio file temporarily
-        tmp_dir = tempfile.mkdtemp(prefix="iqra_api_")
-        try:
-            saved_path = os.path.join(tmp_dir, audio_file.filename)
-            audio_file.save(saved_path)
-
-            # Evaluate recitation
-            result = evaluate_recitation_api(saved_path, surah_id, ayah_number, language)
-            return jsonify(result)
-
-        finally:
-            # Clean up temporary files
-            try:
-                shutil.rmtree(tmp_dir)
-            except Exception:
-                pass
+            with admitted() as queue_wait:
+                if PROFILING_ENABLED and profile_requested():
+                    result = run_profiled(evaluate_check, queue_wait=queue_wait, **params)
+                else:
+                    result = evaluate_check(queue_wait=queue_wait, **params)
+        except AdmissionRejected as rejection:
+            return overloaded_response(rejection, language)
+        return jsonify(result)
 
     except Exception as e:
         import traceback
@@ -669,22 +1209,258 @@ def api_check_recitation():
         }), 500
 
 
-def evaluate_recitation_web(file_path, surah_id, ayah_number, language="ar"):
+# ------------- مهام الفحص غير المتزامنة -------------
+# Inference threads are sized separately from the web server threads; jobs still take
+# admission slots, so they share ADMISSION_MAX_CONCURRENCY with the synchronous requests
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "2"))
+JOBS_MAX_PENDING = int(os.environ.get("JOBS_MAX_PENDING", "32"))
+JOBS_TTL = int(os.environ.get("JOBS_TTL", "600"))
+
+
+def run_check_job(**params):
+    with admitted(background=True) as queue_wait:
+        return evaluate_check(queue_wait=queue_wait, **params)
+
+
+job_manager = JobManager(
+    run_check_job,
+    max_workers=INFERENCE_WORKERS,
+    max_pending=JOBS_MAX_PENDING,
+    ttl=JOBS_TTL,
+)
+
+
+@app.route("/api/check/jobs", methods=["POST"])
+def api_create_check_job():
+    """Queue a recitation check and return its job ID immediately."""
+    language, params, error_response = parse_check_form()
+    if error_response:
+        return error_response
+
+    try:
+        job_id = job_manager.submit(**params)
+    except JobQueueFull:
+        response = jsonify({"error": get_translation("server_busy", language)})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/check/jobs/{job_id}",
+        "events_url": f"/api/check/jobs/{job_id}/events",
+    }), 202
+
+
+@app.route("/api/check/jobs/<job_id>", methods=["GET"])
+def api_get_check_job(job_id):
+    """Job status, plus the evaluation result (with performance_breakdown) once completed."""
+    job = job_manager.get(job_id)
+    if job is None:
+        language = request.args.get('lang', 'en')
+        return jsonify({"error": get_translation("job_not_found", language)}), 404
+    return jsonify(job)
+
+
+@app.route("/api/check/jobs/<job_id>/events", methods=["GET"])
+def api_check_job_events(job_id):
+    """Server-sent events stream that pushes the job result when it is ready."""
+    if job_manager.get(job_id) is None:
+        language = request.args.get('lang', 'en')
+        return jsonify({"error": get_translation("job_not_found", language)}), 404
+
+    def stream():
+        while True:
+            job = job_manager.wait(job_id, timeout=15)
+            if job is None:
+                return
+            if job["status"] in (COMPLETED, FAILED):
+                yield f"event: {job['status']}\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+                return
+            yield ": keep-alive\n\n"
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ------------- فحص دفعة من التسجيلات (تصحيح تلاوات الفصل) -------------
+# One upload with many recordings: each distinct reference is fetched once and the items are
+# evaluated in parallel, each holding its own admission slot (so a batch never runs more
+# evaluations than ADMISSION_MAX_CONCURRENCY); batches of CHECK_BATCH_STREAM_MIN_ITEMS or more
+# stream NDJSON results
+CHECK_BATCH_MAX_ITEMS = int(os.environ.get("CHECK_BATCH_MAX_ITEMS", "50"))
+CHECK_BATCH_WORKERS = int(os.environ.get(
+    "CHECK_BATCH_WORKERS", str(min(os.cpu_count() or 2, ADMISSION_MAX_CONCURRENCY or os.cpu_count() or 2))
+))
+CHECK_BATCH_STREAM_MIN_ITEMS = int(os.environ.get("CHECK_BATCH_STREAM_MIN_ITEMS", "10"))
+_batch_pool = ThreadPoolExecutor(max_workers=CHECK_BATCH_WORKERS, thread_name_prefix="check-batch")
+
+
+def parse_check_batch_form():
+    """
+    Validate the /api/check_batch form: several `audio` files with one surah_id and
+    ayah_number each (in the same order), or a single value shared by all files.
+    Returns (options, items, error response or None).
+    """
+    options = parse_check_options()
+    language = options["language"]
+    # Comparing decoders doubles the ASR work of every item; not offered for batches
+    options.pop("compare_decoding")
+
+    audio_files = request.files.getlist('audio')
+    if not audio_files or any(f.filename == "" for f in audio_files):
+        return options, None, (jsonify({
+            "error": get_translation("missing_audio", language)
+        }), 400)
+    if len(audio_files) > CHECK_BATCH_MAX_ITEMS:
+        return options, None, (jsonify({
+            "error": get_translation("batch_too_large", language),
+            "max_items": CHECK_BATCH_MAX_ITEMS
+        }), 400)
+
+    def per_item(name):
+        values = request.form.getlist(name)
+        return values * len(audio_files) if len(values) == 1 else values
+
+    try:
+        surah_ids, ayah_numbers = per_item('surah_id'), per_item('ayah_number')
+        if len(surah_ids) != len(audio_files) or len(ayah_numbers) != len(audio_files):
+            raise ValueError("one surah_id/ayah_number per file expected")
+        items = [
+            {
+                "filename": audio_file.filename,
+                "audio_data": audio_file.read(),
+                "surah_id": int(surah_id),
+                "ayah_number": int(ayah_number),
+            }
+            for audio_file, surah_id, ayah_number in zip(audio_files, surah_ids, ayah_numbers)
+        ]
+    except (TypeError, ValueError):
+        return options, None, (jsonify({
+            "error": get_translation("missing_surah", language)
+        }), 400)
+    return options, items, None
+
+
+def evaluate_batch(items, references, language="en", **options):
+    """Evaluate the items on the batch pool; yields each item's result as soon as it completes."""
+    def evaluate_item(index, item):
+        item_start = time.time()
+        reference_raw = references[(item["surah_id"], item["ayah_number"])]
+        if reference_raw:
+            try:
+                with admitted() as queue_wait:
+                    result = evaluate_recitation_api(
+                        item["audio_data"], item["surah_id"], item["ayah_number"], language,
+                        reference_raw=reference_raw, **options
+                    )
+                add_queue_wait(result, queue_wait)
+            except AdmissionRejected as rejection:
+                result = rejection_result(rejection, language)
+        else:
+            result = {"error": get_translation("ayah_not_found", language)}
+        record_evaluation_metrics("batch", result)
+        return {
+            "index": index,
+            "filename": item["filename"],
+            "surah_id": item["surah_id"],
+            "ayah_number": item["ayah_number"],
+            **result,
+            "item_time": round(time.time() - item_start, 2),
+        }
+
+    futures = [_batch_pool.submit(evaluate_item, index, item) for index, item in enumerate(items)]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # Client went away mid-stream: drop the items that haven't started
+        for future in futures:
+            future.cancel()
+
+
+@app.route("/api/check_batch", methods=["POST"])
+def api_check_batch():
+    """
+    Evaluate a class's recordings in one request. Results come back in request
+    order with per-item and total timings, or (stream=1, application/x-ndjson,
+    or large batches) as NDJSON lines in completion order followed by a summary line.
+    """
+    options, items, error_response = parse_check_batch_form()
+    if error_response:
+        return error_response
+    language = options["language"]
+    total_start = time.time()
+
+    # Each distinct (surah, ayah) reference is fetched once for the whole batch
+    ref_start = time.time()
+    keys = dict.fromkeys((item["surah_id"], item["ayah_number"]) for item in items)
+    references = {key: get_ayah_text(*key) for key in keys}
+    ref_time = time.time() - ref_start
+    print(f"📚 Batch of {len(items)} recordings, {len(references)} distinct ayahs fetched in {ref_time:.2f}s")
+
+    def summary(results):
+        succeeded = sum(1 for r in results if r.get("success"))
+        total_time = time.time() - total_start
+        # Seconds the items spent waiting for admission slots, summed over the batch
+        queue_wait = sum(r.get("performance_breakdown", {}).get("queue_wait", 0.0) for r in results)
+        return {
+            "items": len(items),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "references_fetched": len(references),
+            "processing_time": round(total_time, 2),
+            "performance_breakdown": {
+                "queue_wait": round(queue_wait, 3),
+                "reference_lookup": round(ref_time, 2),
+                "evaluation": round(total_time - ref_time, 2),
+            },
+        }
+
+    stream = request.form.get('stream')
+    if stream is None:
+        wants_ndjson = "application/x-ndjson" in request.headers.get("Accept", "")
+        stream = "1" if wants_ndjson or len(items) >= CHECK_BATCH_STREAM_MIN_ITEMS else "0"
+
+    if stream == "1":
+        def generate():
+            results = []
+            for result in evaluate_batch(items, references, **options):
+                results.append(result)
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            yield json.dumps({"summary": summary(results)}, ensure_ascii=False) + "\n"
+
+        return Response(
+            generate(),
+            mimetype="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    results = sorted(evaluate_batch(items, references, **options), key=lambda r: r["index"])
+    rejected = [r for r in results if "retry_after" in r]
+    if len(rejected) == len(results):
+        # Nothing could be admitted: fail the batch as a whole, like an overloaded /api/check
+        retry_after = max(r["retry_after"] for r in rejected)
+        response = jsonify({**rejected[0], "retry_after": retry_after, "results": results, **summary(results)})
+        response.headers["Retry-After"] = str(retry_after)
+        return response, 503
+    return jsonify({"success": True, "results": results, **summary(results)})
+
+
+def evaluate_recitation_web(audio_data, surah_id, ayah_number, language="ar"):
     """
     Evaluate recitation for web interface with language support.
     Returns dictionary for template rendering.
     """
     try:
-        # Convert audio to WAV if needed
-        try:
-            wav_path = convert_to_wav(file_path)
-        except Exception as e:
-            print("Audio convert error:", e)
-            wav_path = file_path
+        # Decode audio in memory
+        audio = load_audio(audio_data, MAX_AUDIO_DURATION_S)
 
         # ASR processing
-        asr_pipeline = get_asr_pipeline()
-        asr_result = asr_pipeline(wav_path)
+        asr_result = transcribe_long_audio(audio)
         hypothesis = asr_result.get("text", "").strip()
 
         # Get reference text
@@ -694,30 +1470,18 @@ def evaluate_recitation_web(file_path, surah_id, ayah_number, language="ar"):
                 "error": get_translation("ayah_not_found", language)
             }
 
-        # Normalize texts for comparison
-        ref_norm = normalize_text_for_compare(reference_raw)
-        hyp_norm = normalize_text_for_compare(hypothesis)
-
-        # Calculate WER
-        try:
-            wer_score = wer(ref_norm, hyp_norm) if ref_norm and hyp_norm else 1.0
-        except Exception:
-            wer_score = 1.0
-
-        # Get contextual feedback
-        feedback = get_feedback_message(wer_score, language)
-
-        # Create colored diff for web display
-        colored_html = create_colored_diff(ref_norm, hyp_norm)
+        # WER, feedback and colored diff for web display from one alignment
+        reference = get_reference(surah_id, ayah_number, reference_raw)
+        scores = score_hypothesis(hypothesis, reference, language, with_html=True)
 
         return {
             "success": True,
-            "wer_score": wer_score,
-            "accuracy_percentage": round((1 - wer_score) * 100, 1),
+            "wer_score": scores["wer_score"],
+            "accuracy_percentage": scores["accuracy_percentage"],
             "detected_text": hypothesis,
             "reference_text": reference_raw,
-            "feedback": feedback,
-            "colored_diff": colored_html,
+            "feedback": scores["feedback"],
+            "colored_diff": scores["colored_diff"],
             "language": language,
             "surah_id": surah_id,
             "ayah_number": ayah_number
@@ -730,7 +1494,118 @@ def evaluate_recitation_web(file_path, surah_id, ayah_number, language="ar"):
         }
 
 
-def evaluate_recitation_api(file_path, surah_id, ayah_number, language="en"):
+# ------------- التخزين المؤقت للنتائج -------------
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR") or None
+RESULT_CACHE_DISK_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_DISK_MAX_ENTRIES", "4096"))
+RESULT_CACHE_DISK_TTL = int(os.environ.get("RESULT_CACHE_DISK_TTL", str(7 * 86400)))
+result_cache = ResultCache(
+    max_entries=RESULT_CACHE_SIZE,
+    disk_dir=RESULT_CACHE_DIR,
+    disk_max_entries=RESULT_CACHE_DISK_MAX_ENTRIES,
+    disk_ttl=RESULT_CACHE_DISK_TTL,
+) if RESULT_CACHE_SIZE > 0 else None
+
+
+def decode_settings_key(decode_mode="default", decode_profile=None):
+    """Everything besides the audio that changes the transcription."""
+    backend = "faster-whisper" if USE_FASTER_WHISPER else "transformers"
+    decode_profile = decode_profile or DEFAULT_DECODE_PROFILE
+    return (
+        f"{MODEL_NAME}|{backend}|batched={inference_scheduler is not None}|mode={decode_mode}"
+        f"|load={ASR_LOAD_OPTIONS['compute_type']}|profile={profile_key(decode_profile, DECODE_PROFILES[decode_profile])}"
+    )
+
+
+def transcribe_upload(audio_data, reference_text=None, decode_profile=None, max_duration_s=None):
+    """Decode and transcribe uploaded bytes; returns the ASR result with stage timings."""
+    # 1. Decode audio in memory to 16 kHz mono float32 (TIMED)
+    audio_start = time.time()
+    try:
+        audio, audio_stats = prepare_audio(audio_data, max_duration_s or MAX_AUDIO_DURATION_S)
+    except Exception as e:
+        print(f"❌ Audio decode error: {e}")
+        return {"decode_error": str(e)}
+    audio_time = time.time() - audio_start
+    print(
+        f"✅ Audio decoded in {audio_stats['audio_decode']:.2f}s, silence trimmed in "
+        f"{audio_stats['silence_trimming']:.3f}s ({audio_stats['original_duration']:.1f}s -> "
+        f"{audio_stats['trimmed_duration']:.1f}s of audio)"
+    )
+
+    # 2. ASR processing with OPTIMIZED faster-whisper (TIMED)
+    print("🎤 Starting OPTIMIZED speech recognition...")
+    asr_start = time.time()
+    
+    # Use the optimized transcription function
+    asr_result = transcribe_long_audio(audio, reference_text, decode_profile)
+    
+    asr_time = time.time() - asr_start
+    print(f"⚡ Speech recognition time: {asr_time:.2f}s")
+    return {"asr_result": asr_result, "audio_time": audio_time, "asr_time": asr_time, "audio_stats": audio_stats}
+
+
+def compare_decode_modes(audio_data, reference_raw, reference, decode_profile=None):
+    """Run the default and reference-guided decoders on the same audio and compare speed and WER."""
+    audio = load_audio(audio_data, MAX_AUDIO_DURATION_S)
+    comparison = {}
+    for mode in DECODE_MODES:
+        start = time.time()
+        asr_result = transcribe_long_audio(audio, reference_raw if mode == "guided" else None, decode_profile)
+        asr_time = time.time() - start
+        comparison[mode] = {
+            # "default" for the guided run too when the recording spans several windows
+            "decode_mode": asr_result.get("decode_mode", "default"),
+            "speech_recognition": round(asr_time, 3),
+            "wer_score": score_hypothesis(asr_result.get("text", ""), reference)["wer_score"],
+            "detected_text": asr_result.get("text", "").strip(),
+        }
+
+    default, guided = comparison["default"], comparison["guided"]
+    comparison["speedup"] = round(default["speech_recognition"] / max(guided["speech_recognition"], 1e-6), 2)
+    comparison["wer_delta"] = round(guided["wer_score"] - default["wer_score"], 4)
+    return comparison
+
+
+def evaluate_recitation_api(audio_data, surah_id, ayah_number, language="en",
+                            decode_mode="default", compare_decoding=False, char_analysis=False,
+                            decode_profile=None, reference_raw=None):
+    """
+    Evaluate recitation for API, served from the result cache when the same
+    audio was already evaluated for the same ayah and settings.
+    `reference_raw` skips the reference lookup when the caller already has the ayah text.
+    """
+    if result_cache is None or compare_decoding:
+        return _evaluate_recitation_api(
+            audio_data, None, surah_id, ayah_number, language, decode_mode, compare_decoding, char_analysis,
+            decode_profile, reference_raw
+        )
+
+    lookup_start = time.time()
+    audio_hash = hash_audio(audio_data)
+    key = ResultCache.make_key(
+        audio_hash, "result", surah_id, ayah_number, language, decode_settings_key(decode_mode, decode_profile),
+        "chars" if char_analysis else ""
+    )
+    result, status = result_cache.get_or_compute(
+        key,
+        lambda: _evaluate_recitation_api(
+            audio_data, audio_hash, surah_id, ayah_number, language, decode_mode, char_analysis=char_analysis,
+            decode_profile=decode_profile, reference_raw=reference_raw
+        ),
+        cacheable=lambda r: r.get("success", False),
+    )
+
+    if status != MISS and result.get("success"):
+        result["processing_time"] = round(time.time() - lookup_start, 2)
+        result["performance_breakdown"] = {"result_cache": result["processing_time"]}
+    result["result_cache"] = status
+    return result
+
+
+def _evaluate_recitation_api(audio_data, audio_hash, surah_id, ayah_number, language="en",
+                             decode_mode="default", compare_decoding=False, char_analysis=False,
+                             decode_profile=None, reference_raw=None):
     """
     Evaluate recitation for API with PERFORMANCE MONITORING.
     Returns JSON-formatted result.
@@ -739,56 +1614,56 @@ def evaluate_recitation_api(file_path, surah_id, ayah_number, language="en"):
     
     try:
         print(f"🎯 Starting PERFORMANCE-MONITORED evaluation for Surah {surah_id}, Ayah {ayah_number}")
-        
-        # 1. Convert audio to WAV if needed (TIMED)
-        audio_start = time.time()
-        try:
-            wav_path = convert_to_wav(file_path)
-        except Exception as e:
-            print(f"❌ Audio convert error: {e}")
-            wav_path = file_path
-        audio_time = time.time() - audio_start
-
-        # 2. ASR processing with OPTIMIZED faster-whisper (TIMED)
-        print("🎤 Starting OPTIMIZED speech recognition...")
-        asr_start = time.time()
-        
-        # Use the optimized transcription function
-        asr_result = transcribe_audio_optimized(wav_path)
-        hypothesis = asr_result.get("text", "").strip()
-        is_optimized = asr_result.get("optimized", False)
-        
-        asr_time = time.time() - asr_start
-        print(f"🚀 {'FASTER-WHISPER' if is_optimized else 'TRANSFORMERS'} transcription: '{hypothesis[:50]}...'")
-        print(f"⚡ Speech recognition time: {asr_time:.2f}s")
 
-        # 3. Get reference text (TIMED)
+        # 1. Get reference text first: the guided decoder uses it as its prompt (TIMED)
         ref_start = time.time()
-        reference_raw = get_ayah_text(surah_id, ayah_number)
+        reference_raw = reference_raw or get_ayah_text(surah_id, ayah_number)
         if not reference_raw:
             return {
                 "error": get_translation("ayah_not_found", language),
                 "processing_time": round(time.time() - total_start, 2)
             }
         ref_time = time.time() - ref_start
+        prompt = reference_raw if decode_mode == "guided" else None
+        
+        # 2-3. Decode + ASR; default-mode transcriptions are shared across ayahs for the same audio
+        if result_cache is not None and audio_hash is not None:
+            transcription, transcription_status = result_cache.get_or_compute(
+                ResultCache.make_key(
+                    audio_hash, "asr", decode_settings_key(decode_mode, decode_profile),
+                    f"{surah_id}:{ayah_number}" if prompt else ""
+                ),
+                lambda: transcribe_upload(audio_data, prompt, decode_profile),
+                cacheable=lambda t: "decode_error" not in t,
+            )
+        else:
+            transcription, transcription_status = transcribe_upload(audio_data, prompt, decode_profile), MISS
 
-        # 4. Text processing (TIMED)
-        text_start = time.time()
-        ref_norm = normalize_text_for_compare(reference_raw)
-        hyp_norm = normalize_text_for_compare(hypothesis)
-
-        # Calculate WER
-        try:
-            wer_score = wer(ref_norm, hyp_norm) if ref_norm and hyp_norm else 1.0
-        except Exception:
-            wer_score = 1.0
+        if "decode_error" in transcription:
+            return {
+                "error": get_translation("audio_error", language),
+                "debug_message": transcription["decode_error"],
+                "processing_time": round(time.time() - total_start, 2)
+            }
 
-        # Get contextual feedback
-        feedback = get_feedback_message(wer_score, language)
+        asr_result = transcription["asr_result"]
+        hypothesis = asr_result.get("text", "").strip()
+        is_optimized = asr_result.get("optimized", False)
+        fresh = transcription_status == MISS
+        audio_time = transcription["audio_time"] if fresh else 0.0
+        asr_time = transcription["asr_time"] if fresh else 0.0
+        audio_stats = transcription["audio_stats"]
+        print(f"🚀 {'FASTER-WHISPER' if is_optimized else 'TRANSFORMERS'} transcription ({transcription_status}): '{hypothesis[:50]}...'")
 
-        # Create word-by-word analysis
-        word_analysis = create_word_analysis(ref_norm, hyp_norm)
+        # 4. Text processing (TIMED)
+        text_start = time.time()
+        reference = get_reference(surah_id, ayah_number, reference_raw)
+        scores = score_hypothesis(hypothesis, reference, language, char_analysis=char_analysis)
         text_time = time.time() - text_start
+
+        decode_comparison = None
+        if compare_decoding:
+            decode_comparison = compare_decode_modes(audio_data, reference_raw, reference, decode_profile)
         
         total_time = time.time() - total_start
         
@@ -802,12 +1677,9 @@ def evaluate_recitation_api(file_path, surah_id, ayah_number, language="en"):
 
         return {
             "success": True,
-            "wer_score": wer_score,
-            "accuracy_percentage": round((1 - wer_score) * 100, 1),
+            **scores,
             "detected_text": hypothesis,
             "reference_text": reference_raw,
-            "feedback": feedback,
-            "word_analysis": word_analysis,
             "language": language,
             "surah_id": surah_id,
             "ayah_number": ayah_number,
@@ -815,11 +1687,21 @@ def evaluate_recitation_api(file_path, surah_id, ayah_number, language="en"):
             "processing_time": round(total_time, 2),
             "performance_breakdown": {
                 "audio_conversion": round(audio_time, 2),
+                "audio_decode": round(audio_stats["audio_decode"] if fresh else 0.0, 3),
+                "silence_trimming": round(audio_stats["silence_trimming"] if fresh else 0.0, 3),
                 "speech_recognition": round(asr_time, 2),
                 "reference_lookup": round(ref_time, 2),
                 "text_processing": round(text_time, 2)
             },
-            "model_used": MODEL_NAME + (" (faster-whisper)" if USE_FASTER_WHISPER else " (transformers)")
+            "model_used": MODEL_NAME + (" (faster-whisper)" if USE_FASTER_WHISPER else " (transformers)"),
+            "audio_duration": audio_stats["original_duration"],
+            "trimmed_duration": audio_stats["trimmed_duration"],
+            "asr_batch_size": asr_result.get("batch_size", 1),
+            "asr_windows": asr_result.get("windows", 1),
+            "decode_mode": asr_result.get("decode_mode", "default"),
+            "decode_profile": decode_profile or DEFAULT_DECODE_PROFILE,
+            "transcription_cache": transcription_status,
+            **({"decode_comparison": decode_comparison} if decode_comparison else {})
         }
 
     except Exception as e:
@@ -834,6 +1716,333 @@ def evaluate_recitation_api(file_path, surah_id, ayah_number, language="en"):
         }
 
 
+def evaluate_range_api(audio_data, surah_id, ayah_start, ayah_end=None, language="en",
+                       decode_mode="default", compare_decoding=False, char_analysis=False,
+                       decode_profile=None):
+    """
+    Evaluate a recitation of several consecutive ayahs (or a whole surah) with one
+    transcription aligned against the concatenated reference.
+    Returns the overall WER plus per-ayah word_analysis, WER and word boundaries.
+    """
+    total_start = time.time()
+    try:
+        # 1. Reference texts for the whole range (TIMED)
+        ref_start = time.time()
+        if ayah_end is None:
+            ayah_end = get_verses_count(surah_id)
+        ayahs = get_reference_range(surah_id, ayah_start, ayah_end) if ayah_end >= ayah_start else None
+        if not ayahs:
+            return {
+                "error": get_translation("ayah_not_found", language),
+                "processing_time": round(time.time() - total_start, 2)
+            }
+        reference_raw = " ".join(raw for _, raw, _ in ayahs)
+        ref_time = time.time() - ref_start
+        print(f"🎯 Range evaluation for Surah {surah_id}, Ayahs {ayah_start}-{ayah_end}")
+
+        # 2-3. One decode + ASR pass over the whole recording
+        prompt = reference_raw if decode_mode == "guided" else None
+        if result_cache is not None:
+            transcription, transcription_status = result_cache.get_or_compute(
+                ResultCache.make_key(
+                    hash_audio(audio_data), "asr", decode_settings_key(decode_mode, decode_profile),
+                    f"{surah_id}:{ayah_start}-{ayah_end}" if prompt else "",
+                    f"max={RANGE_MAX_AUDIO_DURATION_S}s"
+                ),
+                lambda: transcribe_upload(audio_data, prompt, decode_profile, RANGE_MAX_AUDIO_DURATION_S),
+                cacheable=lambda t: "decode_error" not in t,
+            )
+        else:
+            transcription, transcription_status = (
+                transcribe_upload(audio_data, prompt, decode_profile, RANGE_MAX_AUDIO_DURATION_S), MISS
+            )
+
+        if "decode_error" in transcription:
+            return {
+                "error": get_translation("audio_error", language),
+                "debug_message": transcription["decode_error"],
+                "processing_time": round(time.time() - total_start, 2)
+            }
+        asr_result = transcription["asr_result"]
+        hypothesis = asr_result.get("text", "").strip()
+        fresh = transcription_status == MISS
+
+        # 4. Align the hypothesis once against the concatenated reference (TIMED)
+        text_start = time.time()
+        hyp_words = normalize_text_for_compare(hypothesis).split()
+        ref_words = [token for _, _, entry in ayahs for token in entry.tokens]
+        ref_ids = [token_id for _, _, entry in ayahs for token_id in entry.token_ids]
+        # Entries encoded separately (unindexed ayahs) are re-encoded with the hypothesis as one mapping
+        opcodes = align(*reference_index.vocabulary.encode_pair(ref_words, ref_ids, hyp_words))
+        wer_score = error_rate(opcodes, len(ref_words))
+        per_ayah = score_ayahs(
+            opcodes, [(n, raw, entry.tokens) for n, raw, entry in ayahs], hyp_words, char_analysis
+        )
+        audio_stats = transcription["audio_stats"]
+        heard = len(ayahs)
+        if audio_stats.get("truncated"):
+            # Ayahs after the cut were never heard: leave them out instead of grading them missing
+            wer_score, heard = score_heard_ayahs(per_ayah)
+            print(f"⚠️ Recording cut at {RANGE_MAX_AUDIO_DURATION_S}s: {len(ayahs) - heard} trailing ayahs not heard")
+        text_time = time.time() - text_start
+
+        total_time = time.time() - total_start
+        print(f"📊 Range of {len(ayahs)} ayahs / {len(ref_words)} words aligned in {text_time:.3f}s, total {total_time:.2f}s")
+
+        return {
+            "success": True,
+            "wer_score": wer_score,
+            "accuracy_percentage": round(max(0.0, 1 - wer_score) * 100, 1),
+            "feedback": get_feedback_message(wer_score, language),
+            "detected_text": hypothesis,
+            "reference_text": reference_raw,
+            "ayahs": per_ayah,
+            "language": language,
+            "surah_id": surah_id,
+            "ayah_start": ayah_start,
+            "ayah_end": ayah_end,
+            "processing_time": round(total_time, 2),
+            "performance_breakdown": {
+                "audio_conversion": round(transcription["audio_time"] if fresh else 0.0, 2),
+                "speech_recognition": round(transcription["asr_time"] if fresh else 0.0, 2),
+                "reference_lookup": round(ref_time, 2),
+                "text_processing": round(text_time, 2)
+            },
+            "audio_duration": audio_stats["original_duration"],
+            "trimmed_duration": audio_stats["trimmed_duration"],
+            "audio_truncated": bool(audio_stats.get("truncated")),
+            "heard_ayahs": heard,
+            "asr_windows": asr_result.get("windows", 1),
+            "decode_mode": asr_result.get("decode_mode", "default"),
+            "decode_profile": decode_profile or DEFAULT_DECODE_PROFILE,
+            "model_used": MODEL_NAME + (" (faster-whisper)" if USE_FASTER_WHISPER else " (transformers)"),
+            "transcription_cache": transcription_status
+        }
+
+    except Exception as e:
+        import traceback
+        print(f"❌ Range evaluation error: {e}")
+        print(f"🔍 Traceback: {traceback.format_exc()}")
+        return {
+            "error": get_translation("processing_error", language),
+            "debug_message": str(e),
+            "processing_time": round(time.time() - total_start, 2)
+        }
+
+
+def identify_and_evaluate(audio_data, language="en", decode_mode="default",
+                          compare_decoding=False, char_analysis=False, decode_profile=None):
+    """
+    Transcribe once, identify the recited span with the n-gram index and score
+    it against the best candidate. The default-mode transcription is cached
+    under the same key the evaluators use, so scoring reuses it.
+    """
+    total_start = time.time()
+    if result_cache is not None:
+        transcription, transcription_status = result_cache.get_or_compute(
+            ResultCache.make_key(hash_audio(audio_data), "asr", decode_settings_key("default", decode_profile), ""),
+            lambda: transcribe_upload(audio_data, None, decode_profile),
+            cacheable=lambda t: "decode_error" not in t,
+        )
+    else:
+        transcription, transcription_status = transcribe_upload(audio_data, None, decode_profile), MISS
+
+    if "decode_error" in transcription:
+        return {
+            "error": get_translation("audio_error", language),
+            "debug_message": transcription["decode_error"],
+            "processing_time": round(time.time() - total_start, 2)
+        }
+
+    lookup_start = time.time()
+    hyp_words = normalize_text_for_compare(transcription["asr_result"].get("text", "")).split()
+    candidates = ngram_index.lookup(hyp_words, min_score=NGRAM_MIN_SCORE)
+    identification = {
+        "candidates": candidates,
+        "lookup_time": round(time.time() - lookup_start, 4),
+        "transcription": transcription_status,
+    }
+    if not candidates:
+        return {
+            "error": get_translation("ayah_not_identified", language),
+            "identification": identification,
+            "processing_time": round(time.time() - total_start, 2)
+        }
+
+    best = candidates[0]
+    print(f"🔎 Identified Surah {best['surah_id']}, Ayahs {best['ayah_start']}-{best['ayah_end']} (score {best['score']})")
+    if best["ayah_start"] == best["ayah_end"]:
+        result = evaluate_recitation_api(
+            audio_data, best["surah_id"], best["ayah_start"], language, decode_mode, compare_decoding, char_analysis,
+            decode_profile
+        )
+    else:
+        result = evaluate_range_api(
+            audio_data, best["surah_id"], best["ayah_start"], best["ayah_end"], language, decode_mode,
+            char_analysis=char_analysis, decode_profile=decode_profile
+        )
+    result["identification"] = identification
+    result["processing_time"] = round(time.time() - total_start, 2)
+    return result
+
+
+def evaluate_check(queue_wait=None, **params):
+    """
+    Dispatch a parsed /api/check request to the identification, ayah-range or single-ayah evaluator.
+    `queue_wait` (seconds spent in the admission queue) is reported as its own stage.
+    """
+    if params.pop("identify", False):
+        mode, result = "identify", identify_and_evaluate(**params)
+    elif "ayah_start" in params:
+        mode, result = "range", evaluate_range_api(**params)
+    else:
+        mode, result = "single", evaluate_recitation_api(**params)
+    if queue_wait is not None:
+        add_queue_wait(result, queue_wait)
+    record_evaluation_metrics(mode, result)
+    return result
+
+
+# ------------- التلاوة المباشرة (بث مقاطع الصوت) -------------
+STREAM_STEP_S = float(os.environ.get("STREAM_STEP_S", "1.0"))
+STREAM_MAX_DURATION_S = int(os.environ.get("STREAM_MAX_DURATION_S", "120"))
+STREAM_SESSION_TTL = int(os.environ.get("STREAM_SESSION_TTL", "120"))
+stream_sessions = SessionStore(
+    ttl=STREAM_SESSION_TTL, max_sessions=int(os.environ.get("STREAM_MAX_SESSIONS", "32"))
+)
+
+
+def stream_progress(session):
+    """Partial word_analysis over the confirmed words, without the not-yet-recited tail."""
+    reference = session.context["reference"]
+    confirmed = normalize_text_for_compare(" ".join(session.confirmed_words))
+    analysis = create_word_analysis(reference.tokens, confirmed.split())
+    while analysis and analysis[-1]["status"] == "missing":
+        analysis.pop()
+    return {
+        "session_id": session.id,
+        "confirmed_text": " ".join(session.confirmed_words),
+        "pending_text": " ".join(session.pending_words),
+        "word_analysis": analysis,
+        "audio_duration": round(session.duration, 2),
+        "transcription_passes": session.passes,
+    }
+
+
+@app.route("/api/stream", methods=["POST"])
+def api_stream_start():
+    """Open a streaming recitation session for a chosen (surah, ayah)."""
+    language = request.form.get('language', 'en')
+    if not is_supported_language(language):
+        language = 'en'
+
+    try:
+        surah_id = int(request.form.get('surah_id'))
+        ayah_number = int(request.form.get('ayah_number'))
+    except (TypeError, ValueError):
+        return jsonify({"error": get_translation("missing_surah", language)}), 400
+
+    reference_raw = get_ayah_text(surah_id, ayah_number)
+    if not reference_raw:
+        return jsonify({"error": get_translation("ayah_not_found", language)}), 404
+
+    session = StreamingSession(
+        transcribe_audio_words,
+        normalize_text_for_compare,
+        audio_format=request.form.get('format', 'pcm_s16le'),
+        step_s=STREAM_STEP_S,
+        max_duration_s=STREAM_MAX_DURATION_S,
+        admit=admitted,
+        surah_id=surah_id,
+        ayah_number=ayah_number,
+        language=language,
+        reference_raw=reference_raw,
+        reference=get_reference(surah_id, ayah_number, reference_raw),
+    )
+    try:
+        stream_sessions.add(session)
+    except TooManySessions as e:
+        print(f"⚠️ Streaming session refused: {e}")
+        response = jsonify({"error": get_translation("server_busy", language)})
+        # Idle sessions free their slot after the TTL at the latest
+        response.headers["Retry-After"] = str(STREAM_SESSION_TTL)
+        return response, 503
+    return jsonify({
+        "session_id": session.id,
+        "format": session.audio_format,
+        "sample_rate": 16000 if session.audio_format in PCM_FORMATS else None,
+        "chunk_url": f"/api/stream/{session.id}/chunk",
+        "finish_url": f"/api/stream/{session.id}/finish",
+    }), 201
+
+
+@app.route("/api/stream/<session_id>/chunk", methods=["POST"])
+def api_stream_chunk(session_id):
+    """Append an audio chunk (raw request body) and return the partial word analysis."""
+    session = stream_sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": get_translation("session_not_found", request.args.get('lang', 'en'))}), 404
+
+    with session.lock:
+        skipped = False
+        try:
+            session.feed(request.get_data())
+        except StreamLimitExceeded:
+            stream_sessions.remove(session_id)
+            message = get_translation("stream_too_long", session.context["language"])
+            return jsonify({"error": message.format(seconds=STREAM_MAX_DURATION_S)}), 413
+        except AdmissionRejected:
+            # The chunk is buffered; the next pass (or finish) transcribes it
+            skipped = True
+        return jsonify({**stream_progress(session), "transcription_skipped": skipped})
+
+
+@app.route("/api/stream/<session_id>/finish", methods=["POST"])
+def api_stream_finish(session_id):
+    """Finish the stream (optionally with a last chunk) and return the full evaluation."""
+    not_found = jsonify({"error": get_translation("session_not_found", request.args.get('lang', 'en'))}), 404
+    session = stream_sessions.get(session_id)
+    if session is None:
+        return not_found
+
+    ctx = session.context
+    try:
+        with admitted():
+            # Claimed only once admitted: a rejected finish can be retried on the same session
+            if stream_sessions.remove(session_id) is None:
+                return not_found
+            with session.lock:
+                finish_start = time.time()
+                hypothesis = session.finish(request.get_data()).strip()
+                asr_time = time.time() - finish_start
+
+                text_start = time.time()
+                scores = score_hypothesis(hypothesis, ctx["reference"], ctx["language"])
+                text_time = time.time() - text_start
+    except AdmissionRejected as rejection:
+        return overloaded_response(rejection, ctx["language"])
+
+    result = {
+        "success": True,
+        **scores,
+        "detected_text": hypothesis,
+        "reference_text": ctx["reference_raw"],
+        "language": ctx["language"],
+        "surah_id": ctx["surah_id"],
+        "ayah_number": ctx["ayah_number"],
+        "processing_time": round(asr_time + text_time, 2),
+        "performance_breakdown": {
+            "final_window_recognition": round(asr_time, 2),
+            "streaming_recognition": round(session.transcribe_time, 2),
+            "text_processing": round(text_time, 2),
+        },
+        "transcription_passes": session.passes,
+        "model_used": MODEL_NAME + (" (faster-whisper)" if USE_FASTER_WHISPER else " (transformers)"),
+    }
+    record_evaluation_metrics("stream", result)
+    return jsonify(result)
+
+
 # ------------- تشغيل التطبيق -------------
 if __name__ == "__main__":
     # اختبار الاتصال بالAPI عند بدء التشغيل
@@ -0,0 +1,198 @@
+# Decode profile auto-tuner
+"""
+Benchmarks candidate faster-whisper settings on the current machine and
+writes the fastest one whose transcripts stay within an accuracy bound, as a
+decode profiles file for ASR_DECODE_PROFILES_FILE:
+
+    python -m asr.autotune --out decode_profiles.json
+    python -m asr.autotune --clips recordings/ --max-wer-delta 0.01
+
+Accuracy is measured as the WER of each candidate's transcripts against the
+transcripts of the "accurate" profile on the same clips, so no ground truth
+is needed. Synthetic clips only exercise the timing; use --clips with real
+recitations to make the accuracy bound meaningful.
+
+The search runs in two stages to keep the number of model loads small:
+first the load settings (compute_type x cpu_threads) with the "balanced"
+decode settings, then every combination of decode settings on the best load
+settings.
+"""
+
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from asr.profiles import BUILTIN_PROFILES, DECODE_SETTINGS, decode_options
+from asr.warmup import warmup_clips
+from data.normalize import normalize_text_for_compare
+from scoring.alignment import align_words
+from scoring.word_analysis import count_errors
+
+DEFAULT_MODEL = "OdyAsh/faster-whisper-base-ar-quran"
+COMPUTE_TYPES = ("int8", "int8_float32", "float32")
+DECODE_GRID = {
+    "beam_size": (1, 2, 5),
+    "without_timestamps": (True, False),
+    "vad_filter": (False, True),
+    "condition_on_previous_text": (False, True),
+}
+
+
+def thread_candidates(cores):
+    return sorted({1, 2, max(1, cores // 2), cores} & set(range(1, cores + 1)))
+
+
+def load_model(model_name, compute_type, cpu_threads):
+    from faster_whisper import WhisperModel
+
+    return WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def transcribe(model, audio, options):
+    segments, _ = model.transcribe(audio, language="ar", **options)
+    return " ".join(segment.text.strip() for segment in segments)
+
+
+def measure(model, clips, options, runs):
+    """Median seconds per pass over all clips (after one untimed pass) and the transcripts."""
+    texts = [transcribe(model, audio, options) for _, audio in clips]
+    passes = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _, audio in clips:
+            transcribe(model, audio, options)
+        passes.append(time.perf_counter() - start)
+    return float(np.median(passes)), texts
+
+
+def wer_against(reference_texts, texts):
+    """Corpus-level WER of `texts` against `reference_texts`."""
+    errors = words = 0
+    for reference, hypothesis in zip(reference_texts, texts):
+        ref_words = normalize_text_for_compare(reference).split()
+        hyp_words = normalize_text_for_compare(hypothesis).split()
+        errors += count_errors(align_words(ref_words, hyp_words))
+        words += len(ref_words)
+    return errors / words if words else 0.0
+
+
+def pick_fastest(results, max_wer_delta):
+    """Fastest result within the bound, or the most accurate one when none is."""
+    within = [r for r in results if r["wer_delta"] <= max_wer_delta]
+    if not within:
+        print(f"⚠️ No candidate within WER delta {max_wer_delta}, keeping the most accurate")
+        return min(results, key=lambda r: (r["wer_delta"], r["latency"]))
+    return min(within, key=lambda r: r["latency"])
+
+
+def autotune(model_name, clips, runs, max_wer_delta, cores):
+    import ctranslate2
+
+    supported = ctranslate2.get_supported_compute_types("cpu")
+    compute_types = [c for c in COMPUTE_TYPES if c in supported]
+    threads = thread_candidates(cores)
+    results = []
+
+    def record(stage, settings, latency, texts):
+        result = {
+            "stage": stage,
+            "settings": settings,
+            "latency": round(latency, 4),
+            "wer_delta": round(wer_against(baseline_texts, texts), 4),
+        }
+        results.append(result)
+        print(f"   {stage:<6} {json.dumps(settings, sort_keys=True)}: "
+              f"{result['latency']:.3f}s/pass, WER delta {result['wer_delta']:.3f}")
+        return result
+
+    # Baseline transcripts: the accurate profile with every core
+    accurate = BUILTIN_PROFILES["accurate"]
+    baseline_compute = accurate["compute_type"] if accurate["compute_type"] in supported else compute_types[-1]
+    print(f"🎯 Baseline: {baseline_compute}, {cores} threads, accurate decode settings")
+    model = load_model(model_name, baseline_compute, cores)
+    baseline_texts = [transcribe(model, audio, decode_options(accurate)) for _, audio in clips]
+
+    # Stage 1: load settings with the balanced decode settings
+    print(f"⚙️ Stage 1: {len(compute_types)} compute types x threads {threads}")
+    balanced = decode_options(BUILTIN_PROFILES["balanced"])
+    load_results = []
+    for compute_type, cpu_threads in itertools.product(compute_types, threads):
+        model = load_model(model_name, compute_type, cpu_threads)
+        latency, texts = measure(model, clips, balanced, runs)
+        load_results.append(record("load", {"compute_type": compute_type, "cpu_threads": cpu_threads}, latency, texts))
+    best_load = pick_fastest(load_results, max_wer_delta)["settings"]
+
+    # Stage 2: decode settings on the best load settings
+    grid = [dict(zip(DECODE_GRID, values)) for values in itertools.product(*DECODE_GRID.values())]
+    print(f"⚙️ Stage 2: {len(grid)} decode settings on {best_load}")
+    model = load_model(model_name, best_load["compute_type"], best_load["cpu_threads"])
+    decode_results = [record("decode", options, *measure(model, clips, options, runs)) for options in grid]
+    best = pick_fastest(decode_results, max_wer_delta)
+
+    profile = {
+        **best_load,
+        # Single-request latency was tuned; parallel transcriptions fill the remaining cores
+        "num_workers": max(1, cores // best_load["cpu_threads"]),
+        **{field: best["settings"][field] for field in DECODE_SETTINGS},
+    }
+    return profile, best, results
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Find the fastest decode settings within an accuracy bound")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="faster-whisper model to tune")
+    parser.add_argument("--clips", help="directory of recordings (default: synthetic clips)")
+    parser.add_argument("--durations", default="5,15,30", help="synthetic clip lengths in seconds")
+    parser.add_argument("--runs", type=int, default=3, help="timed passes per candidate")
+    parser.add_argument("--max-wer-delta", type=float, default=0.02,
+                        help="largest WER allowed against the accurate profile's transcripts")
+    parser.add_argument("--cores", type=int, default=os.cpu_count() or 1, help="cores to tune for")
+    parser.add_argument("--name", default="tuned", help="name of the written profile")
+    parser.add_argument("--out", default="decode_profiles.json", help="profiles file to write")
+    args = parser.parse_args(argv)
+
+    try:
+        import faster_whisper  # noqa: F401
+    except ImportError:
+        print("❌ faster-whisper is not installed")
+        return 1
+
+    clips = warmup_clips([float(d) for d in args.durations.split(",")], args.clips)
+    if not args.clips:
+        print("⚠️ Synthetic clips: timings are representative, the accuracy bound is not (use --clips)")
+
+    print(f"⏱️ Auto-tuning {args.model} on {len(clips)} clips, {args.cores} cores, {args.runs} runs per candidate...")
+    start = time.time()
+    profile, best, results = autotune(args.model, clips, args.runs, args.max_wer_delta, args.cores)
+    print(f"✅ Done in {time.time() - start:.1f}s")
+    print(f"🏆 {args.name}: {json.dumps(profile, sort_keys=True)} "
+          f"({best['latency']:.3f}s/pass, WER delta {best['wer_delta']:.3f})")
+
+    config = {
+        "default": args.name,
+        "profiles": {args.name: profile},
+        "autotune": {
+            "timestamp": int(time.time()),
+            "platform": platform.platform(),
+            "model": args.model,
+            "cores": args.cores,
+            "clips": [name for name, _ in clips],
+            "max_wer_delta": args.max_wer_delta,
+            "results": results,
+        },
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    print(f"💾 Profiles written to {args.out} (set ASR_DECODE_PROFILES_FILE={args.out})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
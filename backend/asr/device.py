@@ -0,0 +1,24 @@
+# Device detection without importing torch
+"""
+CTranslate2 (bundled with faster-whisper) can count CUDA devices itself, so
+choosing between GPU and CPU doesn't need to import torch, which costs
+seconds and hundreds of MB at startup. ASR_DEVICE=cpu|cuda overrides the
+detection.
+"""
+
+import os
+
+
+def cuda_available():
+    """True when a CUDA device can be used for inference."""
+    override = os.environ.get("ASR_DEVICE", "auto").lower()
+    if override in ("cpu", "cuda"):
+        return override == "cuda"
+    try:
+        import ctranslate2
+    except ImportError:
+        return False
+    try:
+        return ctranslate2.get_cuda_device_count() > 0
+    except RuntimeError:
+        return False
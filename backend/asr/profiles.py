@@ -0,0 +1,128 @@
+# Named decode profiles for faster-whisper
+"""
+A profile bundles the settings that trade speed for accuracy. Three are built
+in: "fast" (greedy, no timestamps), "balanced" (faster-whisper's defaults, the
+behaviour before profiles existed) and "accurate" (a wider beam, plus float32
+weights when it is the default profile). A JSON file, for example the one
+written by `python -m asr.autotune`, can add profiles or override the
+built-in ones:
+
+    {
+      "default": "tuned",
+      "profiles": {
+        "tuned": {"base": "fast", "cpu_threads": 4, "beam_size": 2}
+      }
+    }
+
+Fields missing from a profile in the file come from its "base" profile (by
+default the built-in profile with the same name, otherwise "balanced").
+
+compute_type, cpu_threads and num_workers are fixed when the model is loaded,
+so they are taken from the default profile; a profile picked per request only
+changes the decode settings, and one whose decode settings equal the default
+profile's is served as the default profile. On GPU the model is always loaded
+in float16.
+"""
+
+import json
+
+# Fixed when the WhisperModel is built
+LOAD_SETTINGS = ("compute_type", "cpu_threads", "num_workers")
+# Passed to WhisperModel.transcribe for every call
+DECODE_SETTINGS = ("beam_size", "without_timestamps", "vad_filter", "condition_on_previous_text")
+
+BUILTIN_PROFILES = {
+    "fast": {
+        "compute_type": "int8",
+        "cpu_threads": 0,
+        "num_workers": 1,
+        "beam_size": 1,
+        "without_timestamps": True,
+        "vad_filter": False,
+        "condition_on_previous_text": False,
+    },
+    "balanced": {
+        "compute_type": "int8",
+        "cpu_threads": 0,
+        "num_workers": 1,
+        "beam_size": 5,
+        "without_timestamps": False,
+        "vad_filter": False,
+        "condition_on_previous_text": True,
+    },
+    "accurate": {
+        "compute_type": "float32",
+        "cpu_threads": 0,
+        "num_workers": 1,
+        "beam_size": 8,
+        "without_timestamps": False,
+        "vad_filter": False,
+        "condition_on_previous_text": True,
+    },
+}
+
+DEFAULT_PROFILE = "balanced"
+
+
+def _coerce(name, field, value, base):
+    """Check a profile field against the type of the built-in value."""
+    expected = type(base[field])
+    if expected is int and not isinstance(value, bool) and isinstance(value, int) and value >= 0:
+        return value
+    if expected is not int and isinstance(value, expected):
+        return value
+    raise ValueError(f"profile {name!r}: invalid {field} {value!r}")
+
+
+def load_profiles(path=None):
+    """
+    Built-in profiles merged with the ones from the JSON file at `path`.
+    Returns (profiles, default name from the file or None). A missing or
+    invalid file is reported and the built-in profiles are used.
+    """
+    profiles = {name: dict(profile) for name, profile in BUILTIN_PROFILES.items()}
+    if not path:
+        return profiles, None
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        loaded = {}
+        for name, fields in config.get("profiles", {}).items():
+            base_name = fields.get("base", name if name in profiles else DEFAULT_PROFILE)
+            base = loaded.get(base_name) or profiles.get(base_name)
+            if base is None:
+                raise ValueError(f"profile {name!r}: unknown base {base_name!r}")
+            unknown = set(fields) - set(LOAD_SETTINGS + DECODE_SETTINGS) - {"base"}
+            if unknown:
+                raise ValueError(f"profile {name!r}: unknown settings {sorted(unknown)}")
+            profile = dict(base)
+            profile.update(
+                (field, _coerce(name, field, value, base)) for field, value in fields.items() if field != "base"
+            )
+            loaded[name] = profile
+        default = config.get("default")
+        if default is not None and default not in profiles and default not in loaded:
+            raise ValueError(f"unknown default profile {default!r}")
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"⚠️ Ignoring decode profiles file {path}: {e}")
+        return profiles, None
+
+    profiles.update(loaded)
+    print(f"🎛️ Loaded decode profiles from {path}: {', '.join(loaded) or 'none'}")
+    return profiles, default
+
+
+def decode_options(profile):
+    """Keyword arguments for WhisperModel.transcribe."""
+    return {field: profile[field] for field in DECODE_SETTINGS}
+
+
+def load_options(profile):
+    """Keyword arguments for WhisperModel() (CPU)."""
+    return {field: profile[field] for field in LOAD_SETTINGS}
+
+
+def profile_key(name, profile):
+    """Stable description of a profile's decode settings, for cache keys."""
+    return name + ":" + ",".join(f"{field}={profile[field]}" for field in DECODE_SETTINGS)
@@ -0,0 +1,151 @@
+# Micro-batching inference scheduler
+"""
+Collects utterances from concurrent requests for a few milliseconds and runs
+them through the model as one batched encoder/decoder pass.
+
+Each caller gets a Future back and blocks only on its own result, so request
+handlers keep their synchronous shape while throughput scales with the batch
+size instead of the number of worker processes.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+class _Request:
+    __slots__ = ("audio", "future", "enqueued_at")
+
+    def __init__(self, audio):
+        self.audio = audio
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class BatchingScheduler:
+    """
+    Single background thread that groups queued utterances into batches of at
+    most `max_batch_size`, waiting at most `max_wait_ms` after the first one.
+    `run_batch` receives a list of audio arrays and returns one result per item.
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=10):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_started(self):
+        # Started lazily so the thread is created inside the serving process,
+        # not in a parent that forks workers afterwards
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="asr-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, audio):
+        """Queue one utterance and return a Future for its result."""
+        self._ensure_started()
+        request = _Request(audio)
+        self._queue.put(request)
+        return request.future
+
+    def transcribe(self, audio, timeout=None):
+        """Queue one utterance and block until its batch has been decoded."""
+        return self.submit(audio).result(timeout=timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            }
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            try:
+                results = self.run_batch([request.audio for request in batch])
+            except Exception as e:
+                print(f"❌ Batched inference failed: {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+
+            for request, result in zip(batch, results):
+                result["batch_size"] = len(batch)
+                result["queue_wait"] = round(started - request.enqueued_at, 3)
+                request.future.set_result(result)
+
+
+def transcribe_batch(model, audios, language="ar", beam_size=5):
+    """
+    Transcribe up to 30 s utterances with a faster-whisper WhisperModel in one
+    batched CTranslate2 encode + generate call.
+    """
+    import ctranslate2
+    from faster_whisper.audio import pad_or_trim
+    from faster_whisper.tokenizer import Tokenizer
+
+    tokenizer = Tokenizer(
+        model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language=language
+    )
+    n_frames = model.feature_extractor.nb_max_frames
+    features = np.stack(
+        [pad_or_trim(model.feature_extractor(audio), n_frames) for audio in audios]
+    ).astype(np.float32)
+
+    encoder_output = model.model.encode(
+        ctranslate2.StorageView.from_array(np.ascontiguousarray(features))
+    )
+    prompt = model.get_prompt(tokenizer, [], without_timestamps=True)
+    generated = model.model.generate(
+        encoder_output,
+        [prompt] * len(audios),
+        beam_size=beam_size,
+        max_length=model.max_length,
+        suppress_blank=True,
+        suppress_tokens=[-1],
+    )
+
+    results = []
+    for audio, result in zip(audios, generated):
+        tokens = [t for t in result.sequences_ids[0] if t < tokenizer.eot]
+        results.append({
+            "text": tokenizer.decode(tokens).strip(),
+            "language": language,
+            "language_probability": None,
+            "duration": len(audio) / SAMPLE_RATE,
+            "optimized": True,
+        })
+    return results
@@ -0,0 +1,45 @@
+# Splitting long recitations into model-sized windows
+"""
+Cuts long audio into windows of at most `max_window_s` seconds, placing each
+cut at the quietest frame near the end of the window so words are not split.
+"""
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_MS = 10
+MAX_WINDOW_S = 30
+MIN_WINDOW_S = 15
+
+
+def split_at_silence(samples, sampling_rate=SAMPLE_RATE, max_window_s=MAX_WINDOW_S,
+                     min_window_s=MIN_WINDOW_S, frame_ms=FRAME_MS):
+    """
+    Return a list of consecutive sample arrays (views) covering `samples`.
+    Each window is at most `max_window_s` long and ends at the lowest-energy
+    frame found between `min_window_s` and `max_window_s` from its start
+    (the latest one when several are equally quiet).
+    """
+    max_len = int(max_window_s * sampling_rate)
+    if len(samples) <= max_len:
+        return [samples]
+
+    frame_len = sampling_rate * frame_ms // 1000
+    n_frames = len(samples) // frame_len
+    frames = samples[: n_frames * frame_len].reshape(n_frames, frame_len)
+    energy = np.mean(np.square(frames, dtype=np.float32), axis=1)
+
+    max_frames = max_len // frame_len
+    min_frames = min(int(min_window_s * sampling_rate) // frame_len, max_frames - 1)
+
+    windows = []
+    start = 0
+    while len(samples) - start * frame_len > max_len:
+        lo, hi = start + min_frames, min(start + max_frames, n_frames)
+        # Latest of the quietest frames: on ties (e.g. exact-zero gaps) argmin would pick the
+        # first one and cut every window near min_window_s, doubling the 30 s encoder passes
+        cut = hi - 1 - int(np.argmin(energy[lo:hi][::-1]))
+        windows.append(samples[start * frame_len: cut * frame_len])
+        start = cut
+    windows.append(samples[start * frame_len:])
+    return windows
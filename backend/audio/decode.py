@@ -0,0 +1,97 @@
+# In-memory audio decoding
+"""
+Decode uploaded audio bytes straight into a 16 kHz mono float32 NumPy array.
+
+Decoding, down-mixing and resampling happen in a single PyAV (libav/ffmpeg)
+pass, and the resulting array is handed directly to the ASR model, so no
+intermediate WAV file is ever written to disk.
+"""
+
+import io
+import subprocess
+import time
+
+import numpy as np
+
+from audio.vad import trim_silence
+
+SAMPLE_RATE = 16000
+MAX_DURATION_S = 30
+
+
+def _decode_with_pyav(data, sampling_rate):
+    import av
+
+    resampler = av.audio.resampler.AudioResampler(format="flt", layout="mono", rate=sampling_rate)
+    chunks = []
+    with av.open(io.BytesIO(data), mode="r", metadata_errors="ignore") as container:
+        stream = container.streams.audio[0]
+        for frame in container.decode(stream):
+            for resampled in resampler.resample(frame):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+        # Flush the samples still buffered inside the resampler
+        for resampled in resampler.resample(None):
+            chunks.append(resampled.to_ndarray().reshape(-1))
+
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(chunks).astype(np.float32, copy=False)
+
+
+def _decode_with_ffmpeg(data, sampling_rate):
+    result = subprocess.run(
+        [
+            "ffmpeg", "-nostdin", "-loglevel", "error",
+            "-i", "pipe:0",
+            "-f", "f32le", "-ac", "1", "-ar", str(sampling_rate),
+            "pipe:1",
+        ],
+        input=data,
+        capture_output=True,
+        check=True,
+    )
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def decode_audio_bytes(data, sampling_rate=SAMPLE_RATE):
+    """
+    Decode any container/codec supported by ffmpeg (webm/ogg/mp3/m4a/wav...)
+    into a mono float32 array at `sampling_rate`.
+    Uses PyAV when available and falls back to an ffmpeg pipe.
+    """
+    try:
+        import av  # noqa: F401
+    except ImportError:
+        return _decode_with_ffmpeg(data, sampling_rate)
+    return _decode_with_pyav(data, sampling_rate)
+
+
+def prepare_audio(data, max_duration_s=MAX_DURATION_S):
+    """
+    Decode uploaded bytes and prepare them for Whisper: 16 kHz mono float32,
+    silence trimmed, capped at `max_duration_s`.
+    Returns (samples, stats) with the decode and trimming times reported separately.
+    """
+    decode_start = time.time()
+    samples = decode_audio_bytes(data)
+    decode_time = time.time() - decode_start
+
+    trim_start = time.time()
+    samples, stats = trim_silence(samples)
+    trim_time = time.time() - trim_start
+
+    max_samples = max_duration_s * SAMPLE_RATE
+    stats["truncated"] = len(samples) > max_samples
+    if stats["truncated"]:
+        print(f"⏰ Audio > {max_duration_s}s, trimming for faster processing")
+        samples = samples[:max_samples]
+        stats["trimmed_duration"] = float(max_duration_s)
+
+    stats["audio_decode"] = decode_time
+    stats["silence_trimming"] = trim_time
+    return samples, stats
+
+
+def load_audio(data, max_duration_s=MAX_DURATION_S):
+    """Decode and prepare uploaded bytes; returns only the sample array."""
+    return prepare_audio(data, max_duration_s)[0]
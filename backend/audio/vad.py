@@ -0,0 +1,79 @@
+# Vectorized silence trimming / energy-based voice activity detection
+"""
+Finds voiced regions of a decoded PCM array in one vectorized pass over
+10 ms frames: leading and trailing silence is dropped and long internal pauses
+are shortened, so only the voiced parts are handed to ASR.
+"""
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_MS = 10
+SILENCE_THRESH_DBFS = -50
+MIN_SILENCE_MS = 300
+PADDING_MS = 100
+
+
+def _runs(mask):
+    """Start/end indices (end exclusive) of the runs of True in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def voiced_frames(samples, sampling_rate=SAMPLE_RATE, silence_thresh=SILENCE_THRESH_DBFS,
+                  min_silence_ms=MIN_SILENCE_MS, padding_ms=PADDING_MS, frame_ms=FRAME_MS):
+    """
+    Boolean mask over `frame_ms` frames: True for frames to keep.
+    Frames louder than `silence_thresh` dBFS are voiced and keep `padding_ms` of
+    context on each side; internal pauses shorter than `min_silence_ms` are kept whole.
+    """
+    frame_len = sampling_rate * frame_ms // 1000
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=bool), frame_len
+
+    frames = samples[: n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    voiced = rms > 10 ** (silence_thresh / 20)
+    if not voiced.any():
+        return voiced, frame_len
+
+    pad = padding_ms // frame_ms
+    if pad:
+        voiced = np.convolve(voiced, np.ones(2 * pad + 1), mode="same") > 0
+
+    # Re-admit short internal pauses so words are not glued together
+    starts, ends = _runs(~voiced)
+    internal = (starts > 0) & (ends < n_frames) & ((ends - starts) < min_silence_ms // frame_ms)
+    fill = np.zeros(n_frames + 1, dtype=np.int32)
+    np.add.at(fill, starts[internal], 1)
+    np.add.at(fill, ends[internal], -1)
+    voiced |= np.cumsum(fill[:-1]) > 0
+
+    return voiced, frame_len
+
+
+def trim_silence(samples, sampling_rate=SAMPLE_RATE, **options):
+    """
+    Return (voiced_samples, stats). Leading/trailing silence is removed and long
+    pauses are cut down to the padding around the neighbouring speech.
+    """
+    keep, frame_len = voiced_frames(samples, sampling_rate, **options)
+    n_frames = len(keep)
+    original = len(samples)
+
+    if n_frames == 0 or not keep.any():
+        trimmed = samples
+        regions = 1 if original else 0
+    else:
+        body = samples[: n_frames * frame_len].reshape(n_frames, frame_len)[keep].reshape(-1)
+        # The partial frame at the very end follows the last full frame's decision
+        tail = samples[n_frames * frame_len:] if keep[-1] else samples[:0]
+        trimmed = np.concatenate([body, tail]) if len(tail) else body
+        regions = len(_runs(keep)[0])
+
+    return trimmed, {
+        "original_duration": round(original / sampling_rate, 2),
+        "trimmed_duration": round(len(trimmed) / sampling_rate, 2),
+        "voiced_regions": regions,
+    }
@@ -0,0 +1,56 @@
+# Benchmark audio clips
+"""
+Synthetic recitation-shaped clips (voiced bursts separated by short and long
+pauses, with leading/trailing silence) encoded in the formats clients upload,
+or real recordings from a directory named `<surah>_<ayah>.<ext>`.
+"""
+
+import io
+import os
+import re
+
+import numpy as np
+
+from asr.warmup import synthetic_recitation
+
+SAMPLE_RATE = 16000
+
+
+def encode(samples, audio_format="webm", sampling_rate=SAMPLE_RATE):
+    """Encode float samples into an in-memory container (webm/opus, ogg/opus, wav, mp4/aac)."""
+    import av
+
+    codecs = {"webm": "libopus", "ogg": "libopus", "wav": "pcm_s16le", "mp4": "aac"}
+    rate = 48000 if codecs[audio_format] == "libopus" else sampling_rate
+    buffer = io.BytesIO()
+    with av.open(buffer, mode="w", format=audio_format) as container:
+        stream = container.add_stream(codecs[audio_format], rate=rate)
+        stream.layout = "mono"
+        frame = av.AudioFrame.from_ndarray(
+            (np.clip(samples, -1, 1) * 32767).astype(np.int16).reshape(1, -1), format="s16", layout="mono"
+        )
+        frame.sample_rate = sampling_rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buffer.getvalue()
+
+
+def synthetic_clips(durations=(3, 8, 15, 30), audio_format="webm", reference=(1, 1)):
+    """[(name, audio bytes, (surah_id, ayah_number))] of synthetic clips."""
+    return [
+        (f"synthetic_{d:g}s.{audio_format}", encode(synthetic_recitation(d, seed=int(d * 10)), audio_format), reference)
+        for d in durations
+    ]
+
+
+def directory_clips(path):
+    """Real recordings named `<surah>_<ayah>.<ext>` from `path`."""
+    clips = []
+    for name in sorted(os.listdir(path)):
+        match = re.match(r"^(\d+)_(\d+)\.\w+$", name)
+        if match:
+            with open(os.path.join(path, name), "rb") as f:
+                clips.append((name, f.read(), (int(match.group(1)), int(match.group(2)))))
+    return clips
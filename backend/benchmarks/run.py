@@ -0,0 +1,231 @@
+# Stage-level latency benchmarks for the evaluation pipeline
+"""
+Times each stage of /api/check separately over many runs and reports
+p50/p95/p99 per stage, fully offline (synthetic clips, a temporary local
+corpus and a stub Quran API):
+
+    python -m benchmarks.run --runs 50 --out bench.json
+    python -m benchmarks.run --runs 50 --compare bench.json   # flag regressions
+    python -m benchmarks.run --asr --clips recordings/        # include the ASR model
+
+Speech recognition needs the model (downloaded on first use) and only runs
+with --asr. Without real recordings the hypothesis is the reference with a
+few deterministic mistakes, which exercises the same scoring code.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from audio.decode import decode_audio_bytes
+from audio.vad import trim_silence
+from benchmarks.clips import directory_clips, synthetic_clips
+from benchmarks.stub_quran_api import CHAPTERS, VERSES, StubQuranApi
+from data.normalize import normalize_text_for_compare
+from data.quran_corpus import QuranCorpus, write_corpus
+from data.reference_index import ReferenceIndex
+from scoring.alignment import align
+from scoring.word_analysis import error_rate, word_analysis_from_opcodes
+from services.quran_api import QuranApiClient
+
+PERCENTILES = (50, 95, 99)
+
+
+def summarize(samples):
+    """Latency summary in milliseconds."""
+    values = np.array(samples) * 1000
+    summary = {f"p{p}": round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+    summary.update(
+        mean=round(float(values.mean()), 3),
+        min=round(float(values.min()), 3),
+        max=round(float(values.max()), 3),
+        runs=len(values),
+    )
+    return summary
+
+
+def timed(timings, stage, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    timings.setdefault(stage, []).append(time.perf_counter() - start)
+    return result
+
+
+def perturb(text):
+    """Reference with a dropped word and a wrong harakah, as a stand-in transcription."""
+    words = text.split()
+    if len(words) > 2:
+        del words[len(words) // 2]
+    words[0] = words[0].replace("َ", "ِ", 1)
+    return " ".join(words)
+
+
+def load_asr():
+    """Import the app and load the model up front so the first timed run doesn't include it."""
+    import app
+
+    app.get_asr_pipeline()
+    return app.transcribe_audio_optimized
+
+
+def benchmark_fixture(clips):
+    """
+    Chapters and verses for the temporary corpus and the stub API: the bundled
+    fixture plus the ayahs of real clips, taken from the local corpus
+    (QURAN_CORPUS_PATH). Clips whose ayah is in neither are left out.
+    Returns (clips, chapters, verses, skipped clip names).
+    """
+    chapters, verses = list(CHAPTERS), dict(VERSES)
+    corpus = QuranCorpus()
+    kept, skipped = [], []
+    for clip in clips:
+        name, _, (surah_id, ayah_number) = clip
+        if (surah_id, ayah_number) not in verses:
+            text = corpus.get_ayah(surah_id, ayah_number)
+            if not text:
+                skipped.append(name)
+                continue
+            verses[(surah_id, ayah_number)] = text
+            chapter = corpus.get_chapter(surah_id)
+            if chapter and all(ch["id"] != surah_id for ch in chapters):
+                chapters.append(chapter)
+        kept.append(clip)
+    return kept, chapters, verses, skipped
+
+
+def run(clips, runs, asr, api_latency_ms, chapters=CHAPTERS, verses=VERSES):
+    timings = {}
+    transcribe = load_asr() if asr else None
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            StubQuranApi(latency_ms=api_latency_ms, chapters=chapters, verses=verses) as stub:
+        corpus_path = os.path.join(tmp, "corpus.sqlite")
+        write_corpus(corpus_path, chapters, [(s, a, text) for (s, a), text in verses.items()], "benchmark")
+        corpus = QuranCorpus(corpus_path)
+        index = ReferenceIndex.from_corpus(corpus, normalize_text_for_compare)
+        client = QuranApiClient(stub.base_url)
+
+        for _ in range(runs):
+            for name, data, (surah_id, ayah_number) in clips:
+                samples = timed(timings, "audio_decode", decode_audio_bytes, data)
+                samples, _ = timed(timings, "silence_trimming", trim_silence, samples)
+
+                reference_raw = timed(timings, "reference_lookup_corpus", corpus.get_ayah, surah_id, ayah_number)
+                timed(timings, "reference_lookup_api", client.get_json, f"/verses/by_key/{surah_id}:{ayah_number}")
+                reference = timed(timings, "reference_index", index.get, surah_id, ayah_number)
+
+                if transcribe:
+                    hypothesis = timed(timings, "speech_recognition", transcribe, samples).get("text", "")
+                else:
+                    hypothesis = perturb(reference_raw)
+
+                hyp_words = timed(timings, "normalization", normalize_text_for_compare, hypothesis).split()
+                ref_ids, hyp_ids = index.vocabulary.encode_pair(reference.tokens, reference.token_ids, hyp_words)
+                opcodes = timed(timings, "alignment", align, ref_ids, hyp_ids)
+                timed(timings, "wer", error_rate, opcodes, len(reference.tokens))
+                timed(timings, "word_analysis", word_analysis_from_opcodes, opcodes, reference.tokens, hyp_words)
+
+    return {stage: summarize(values) for stage, values in timings.items()}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print per-stage p50/p95 changes; return the stages whose p95 regressed beyond `threshold`."""
+    regressions = []
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous:
+            print(f"   {stage:<26} new")
+            continue
+        change = (current["p95"] - previous["p95"]) / max(previous["p95"], 1e-6)
+        flag = ""
+        if change > threshold:
+            regressions.append(stage)
+            flag = "  ⚠️ regression"
+        print(f"   {stage:<26} p50 {previous['p50']:>9.3f} -> {current['p50']:>9.3f} ms   "
+              f"p95 {previous['p95']:>9.3f} -> {current['p95']:>9.3f} ms ({change:+.0%}){flag}")
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the recitation evaluation pipeline stage by stage")
+    parser.add_argument("--runs", type=int, default=20, help="passes over all clips")
+    parser.add_argument("--clips", help="directory of recordings named <surah>_<ayah>.<ext>")
+    parser.add_argument("--format", default="webm", choices=("webm", "ogg", "wav", "mp4"),
+                        help="container for synthetic clips")
+    parser.add_argument("--durations", default="3,8,15,30", help="synthetic clip lengths in seconds")
+    parser.add_argument("--asr", action="store_true", help="also time speech recognition (loads the model)")
+    parser.add_argument("--api-latency-ms", type=float, default=0, help="latency added by the stub Quran API")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 increase counted as a regression")
+    args = parser.parse_args(argv)
+
+    if args.clips:
+        clips = directory_clips(args.clips)
+    else:
+        durations = [float(d) for d in args.durations.split(",")]
+        clips = synthetic_clips(durations, args.format)
+    clips, chapters, verses, skipped = benchmark_fixture(clips)
+    if skipped:
+        print(f"⚠️ Skipping {len(skipped)} clips whose ayah is neither in the fixture nor in the local corpus "
+              f"(build it with: python -m data.quran_corpus sync): {', '.join(skipped)}")
+    if not clips:
+        print("❌ No clips to benchmark")
+        return 1
+
+    print(f"⏱️ Benchmarking {len(clips)} clips x {args.runs} runs{' with ASR' if args.asr else ''}...")
+    start = time.time()
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+            "clips": [name for name, _, _ in clips],
+            "skipped_clips": skipped,
+            "asr": args.asr,
+            "api_latency_ms": args.api_latency_ms,
+        },
+        "stages": run(clips, args.runs, args.asr, args.api_latency_ms, chapters, verses),
+    }
+    print(f"✅ Done in {time.time() - start:.1f}s")
+
+    for stage, summary in results["stages"].items():
+        print(f"   {stage:<26} " + "  ".join(f"p{p} {summary[f'p{p}']:>9.3f} ms" for p in PERCENTILES))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"📊 Compared with {args.compare} ({baseline.get('meta', {}).get('revision')}):")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ p95 regressed by more than {args.threshold:.0%} in: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
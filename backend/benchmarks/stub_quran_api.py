@@ -0,0 +1,142 @@
+# Local stand-in for api.quran.com used by the benchmarks
+"""
+Serves the handful of Quran.com v4 endpoints the backend calls from a small
+bundled fixture, with an optional artificial latency, so benchmarks and
+tests never depend on the network:
+
+    with StubQuranApi(latency_ms=20) as stub:
+        client = QuranApiClient(stub.base_url)
+
+`stub.fail(count, status)` answers the next `count` requests with an error
+status, and `stub.requests` counts the requests received, for exercising the
+client's retries and circuit breaker.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHAPTERS = [
+    {"id": 1, "name_arabic": "الفاتحة", "name_simple": "Al-Fatihah", "verses_count": 7, "revelation_place": "makkah"},
+    {"id": 108, "name_arabic": "الكوثر", "name_simple": "Al-Kawthar", "verses_count": 3, "revelation_place": "makkah"},
+    {"id": 112, "name_arabic": "الإخلاص", "name_simple": "Al-Ikhlas", "verses_count": 4, "revelation_place": "makkah"},
+]
+
+VERSES = {
+    (1, 1): "بِسْمِ اللَّهِ الرَّحْمَنِ الرَّحِيمِ",
+    (1, 2): "الْحَمْدُ لِلَّهِ رَبِّ الْعَالَمِينَ",
+    (1, 3): "الرَّحْمَنِ الرَّحِيمِ",
+    (1, 4): "مَالِكِ يَوْمِ الدِّينِ",
+    (1, 5): "إِيَّاكَ نَعْبُدُ وَإِيَّاكَ نَسْتَعِينُ",
+    (1, 6): "اهْدِنَا الصِّرَاطَ الْمُسْتَقِيمَ",
+    (1, 7): "صِرَاطَ الَّذِينَ أَنْعَمْتَ عَلَيْهِمْ غَيْرِ الْمَغْضُوبِ عَلَيْهِمْ وَلَا الضَّالِّينَ",
+    (108, 1): "إِنَّا أَعْطَيْنَاكَ الْكَوْثَرَ",
+    (108, 2): "فَصَلِّ لِرَبِّكَ وَانْحَرْ",
+    (108, 3): "إِنَّ شَانِئَكَ هُوَ الْأَبْتَرُ",
+    (112, 1): "قُلْ هُوَ اللَّهُ أَحَدٌ",
+    (112, 2): "اللَّهُ الصَّمَدُ",
+    (112, 3): "لَمْ يَلِدْ وَلَمْ يُولَدْ",
+    (112, 4): "وَلَمْ يَكُنْ لَهُ كُفُوًا أَحَدٌ",
+}
+
+
+def _verse(verses, surah_id, ayah_number):
+    return {
+        "verse_key": f"{surah_id}:{ayah_number}",
+        "verse_number": ayah_number,
+        "text_imlaei": verses[(surah_id, ayah_number)],
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Handlers take the server (for its chapters/verses) followed by the URL groups
+    routes = [
+        (re.compile(r"^/chapters$"), lambda srv: {"chapters": srv.chapters}),
+        (
+            re.compile(r"^/chapters/(\d+)$"),
+            lambda srv, s: {"chapter": next(ch for ch in srv.chapters if ch["id"] == int(s))},
+        ),
+        (
+            re.compile(r"^/chapters/(\d+)/verses$"),
+            lambda srv, s: {"verses": [_verse(srv.verses, *k) for k in sorted(srv.verses) if k[0] == int(s)]},
+        ),
+        (
+            re.compile(r"^/verses/by_key/(\d+):(\d+)$"),
+            lambda srv, s, a: {"verse": _verse(srv.verses, int(s), int(a))},
+        ),
+    ]
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+            failing = self.server.failures > 0
+            if failing:
+                self.server.failures -= 1
+        if self.server.latency_s:
+            time.sleep(self.server.latency_s)
+        if failing:
+            self.send_response(self.server.failure_status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        path = self.path.split("?", 1)[0]
+        for pattern, handler in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            try:
+                body = json.dumps(handler(self.server, *match.groups()), ensure_ascii=False).encode("utf-8")
+            except (KeyError, StopIteration):
+                break
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StubQuranApi:
+    """
+    Threaded HTTP stub on a free local port; use as a context manager.
+    Serves the bundled fixture unless other `chapters` / `verses` are given.
+    """
+
+    def __init__(self, latency_ms=0, chapters=None, verses=None):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.latency_s = latency_ms / 1000
+        self.server.chapters = CHAPTERS if chapters is None else chapters
+        self.server.verses = VERSES if verses is None else verses
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.failures = 0
+        self.server.failure_status = 503
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        """Requests received so far."""
+        return self.server.requests
+
+    def fail(self, count, status=503):
+        """Answer the next `count` requests with `status`."""
+        with self.server.lock:
+            self.server.failures = count
+            self.server.failure_status = status
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,214 @@
+# Word n-gram inverted index for identifying which ayahs were recited
+"""
+Inverted index from hashed word n-grams of the normalized corpus to their
+positions in the whole-Quran word stream. A hypothesis is identified by
+looking its n-grams up and voting on the stream offset where the recitation
+starts, which ranks candidate (surah, ayah) spans in milliseconds.
+Hypotheses shorter than one n-gram (short ayahs such as 112:2) are matched
+against the hashed full text of every ayah instead.
+
+The index is built offline from the local corpus store and saved as plain
+.npy files that the API opens memory-mapped, so workers start instantly:
+
+    python -m data.ngram_index build
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from data.normalize import normalize_text_for_compare
+from data.quran_corpus import DEFAULT_CORPUS_PATH, QuranCorpus
+
+DEFAULT_INDEX_PATH = os.environ.get(
+    "NGRAM_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "ngram_index"),
+)
+NGRAM_SIZE = 3
+# N-grams repeated more often than this carry no information about the position
+MAX_POSTINGS = 256
+ARRAYS = ("keys", "offsets", "postings", "ayah_starts", "ayah_keys")
+# Whole-ayah text hashes (sorted) and their ayah rows; absent from indexes built before they existed
+TEXT_ARRAYS = ("text_keys", "text_rows")
+
+
+def hash_words(words):
+    """64-bit hash of a word sequence."""
+    return int.from_bytes(hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def hash_ngrams(words, n=NGRAM_SIZE):
+    """64-bit hashes of the consecutive word n-grams of `words`."""
+    return np.array([hash_words(words[i:i + n]) for i in range(len(words) - n + 1)], dtype=np.uint64)
+
+
+def build_index(corpus, path=DEFAULT_INDEX_PATH, n=NGRAM_SIZE, normalize=normalize_text_for_compare):
+    """Build the index from a QuranCorpus and write it to the `path` directory."""
+    words = []
+    ayah_starts, ayah_keys, text_hashes = [], [], []
+    for surah_id, ayah_number, text in corpus.iter_ayahs():
+        ayah_words = normalize(text).split()
+        ayah_starts.append(len(words))
+        ayah_keys.append(surah_id * 1000 + ayah_number)
+        text_hashes.append(hash_words(ayah_words))
+        words.extend(ayah_words)
+
+    # N-grams run across ayah boundaries so multi-ayah recitations match too
+    hashes = hash_ngrams(words, n)
+    order = np.argsort(hashes, kind="stable")
+    keys, starts = np.unique(hashes[order], return_index=True)
+    text_hashes = np.array(text_hashes, dtype=np.uint64)
+    text_order = np.argsort(text_hashes, kind="stable")
+
+    arrays = {
+        "keys": keys,
+        "offsets": np.append(starts, len(order)).astype(np.uint32),
+        "postings": order.astype(np.uint32),
+        "ayah_starts": np.array(ayah_starts, dtype=np.uint32),
+        "ayah_keys": np.array(ayah_keys, dtype=np.uint32),
+        "text_keys": text_hashes[text_order],
+        "text_rows": text_order.astype(np.uint32),
+    }
+    os.makedirs(path, exist_ok=True)
+    for name, values in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), values)
+    meta = {"n": n, "words": len(words), "ngrams": len(keys), "ayahs": len(ayah_keys), "built_at": int(time.time())}
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+class NgramIndex:
+    """Memory-mapped read-only view of an index built by `build_index`."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.meta = {}
+        self._arrays = None
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                self.meta = json.load(f)
+            self._arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+        except (OSError, ValueError):
+            self._arrays = None
+            return
+        try:
+            self._arrays.update(
+                {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in TEXT_ARRAYS}
+            )
+        except (OSError, ValueError):
+            print("⚠️ N-gram index has no whole-ayah hashes; rebuild it to identify recitations "
+                  f"shorter than {self.meta.get('n', NGRAM_SIZE)} words")
+
+    @property
+    def available(self):
+        return self._arrays is not None
+
+    def _locate(self, positions):
+        """Row of the ayah containing each word stream position."""
+        return np.searchsorted(self._arrays["ayah_starts"], positions, side="right") - 1
+
+    def _lookup_text(self, words, top_k):
+        """Ayahs whose whole normalized text equals `words` (for hypotheses shorter than an n-gram)."""
+        if not words or "text_keys" not in self._arrays:
+            return []
+        text_keys, ayah_keys = self._arrays["text_keys"], self._arrays["ayah_keys"]
+        query = np.uint64(hash_words(words))
+        lo, hi = np.searchsorted(text_keys, query, side="left"), np.searchsorted(text_keys, query, side="right")
+        keys = sorted(int(ayah_keys[row]) for row in self._arrays["text_rows"][lo:hi])[:top_k]
+        return [
+            {"surah_id": key // 1000, "ayah_start": key % 1000, "ayah_end": key % 1000, "score": 1.0}
+            for key in keys
+        ]
+
+    def lookup(self, words, top_k=3, min_score=0.0):
+        """
+        Rank candidate spans for a normalized hypothesis word list.
+        Returns up to `top_k` dicts with surah_id, ayah_start, ayah_end and
+        score, the fraction of the hypothesis n-grams found in that span;
+        spans scoring below `min_score` are left out.
+        """
+        if not self.available:
+            return []
+        n = self.meta.get("n", NGRAM_SIZE)
+        if len(words) < n:
+            return self._lookup_text(words, top_k)
+        query = hash_ngrams(words, n)
+
+        keys, offsets = self._arrays["keys"], self._arrays["offsets"]
+        idx = np.searchsorted(keys, query)
+        found = idx < len(keys)
+        found[found] = keys[idx[found]] == query[found]
+        query_pos = np.flatnonzero(found)
+        starts = offsets[idx[found]].astype(np.int64)
+        counts = offsets[idx[found] + 1].astype(np.int64) - starts
+        keep = counts <= MAX_POSTINGS
+        query_pos, starts, counts = query_pos[keep], starts[keep], counts[keep]
+        if not counts.sum():
+            return []
+
+        # Gather all postings at once: every hit votes for a start offset (diagonal)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        positions = self._arrays["postings"][np.repeat(starts, counts) + np.arange(counts.sum()) - first].astype(np.int64)
+        hyp_positions = np.repeat(query_pos, counts)
+        diagonals = positions - hyp_positions
+
+        order = np.argsort(diagonals, kind="stable")
+        diagonals, positions, hyp_positions = diagonals[order], positions[order], hyp_positions[order]
+        # Hits whose diagonals are close belong to the same recitation despite skipped/extra words
+        tolerance = max(3, len(query) // 5)
+        bounds = np.flatnonzero(np.diff(diagonals) > tolerance) + 1
+        clusters = zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(diagonals)])))
+
+        ayah_keys = self._arrays["ayah_keys"]
+        candidates = {}
+        for lo, hi in clusters:
+            score = len(np.unique(hyp_positions[lo:hi])) / len(query)
+            first_row, last_row = self._locate([positions[lo:hi].min(), positions[lo:hi].max() + n - 1])
+            start_key, end_key = int(ayah_keys[first_row]), int(ayah_keys[last_row])
+            surah_id = start_key // 1000
+            if end_key // 1000 != surah_id:
+                # Keep the span inside the surah where it starts
+                end_key = int(ayah_keys[np.searchsorted(ayah_keys, (surah_id + 1) * 1000) - 1])
+            span = (surah_id, start_key % 1000, end_key % 1000)
+            candidates[span] = max(score, candidates.get(span, 0.0))
+
+        candidates = {span: score for span, score in candidates.items() if score >= min_score}
+        ranked = sorted(candidates.items(), key=lambda item: -item[1])[:top_k]
+        return [
+            {"surah_id": s, "ayah_start": a, "ayah_end": b, "score": round(score, 3)}
+            for (s, a, b), score in ranked
+        ]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the word n-gram identification index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build the index from the local corpus store")
+    build.add_argument("--corpus", default=DEFAULT_CORPUS_PATH, help="corpus SQLite file")
+    build.add_argument("--out", default=DEFAULT_INDEX_PATH, help="index directory")
+    build.add_argument("--n", type=int, default=NGRAM_SIZE, help="words per n-gram")
+
+    args = parser.parse_args(argv)
+    corpus = QuranCorpus(args.corpus)
+    if not corpus.available:
+        print(f"❌ Corpus not found at {args.corpus}; run `python -m data.quran_corpus sync` first")
+        return 1
+
+    start = time.time()
+    meta = build_index(corpus, args.out, args.n)
+    print(
+        f"✅ Indexed {meta['ngrams']} {args.n}-grams over {meta['words']} words / "
+        f"{meta['ayahs']} ayahs to {args.out} in {time.time() - start:.1f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+# Text normalization shared by the API and the offline index builders
+"""
+The reference index, the n-gram index and the scorer must all normalize text
+the same way, so the normalizer lives here rather than in app.py.
+"""
+
+import re
+import unicodedata
+
+
+def normalize_text_for_compare(text):
+    """تطبيع النص مع الاحتفاظ بالتشكيل للمقارنة الدقيقة"""
+    if not text:
+        return ""
+
+    # لا نزيل التشكيل، فقط نزيل علامات الترقيم والأرقام
+    text = re.sub(
+        r"[^\w\s\u0600-\u06FF\u064B-\u065F\u0610-\u061A\u06D6-\u06ED]", "", text
+    )  # احتفظ بالحروف العربية والتشكيل
+    text = unicodedata.normalize("NFKC", text)  # تطبيع Unicode للتشكيل
+    return " ".join(text.split())  # تنظيف المسافات
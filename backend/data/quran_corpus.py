@@ -0,0 +1,280 @@
+# Local read-only Quran corpus store (SQLite)
+"""
+Offline copy of the Quran text (text_imlaei) and chapter metadata.
+
+The store is built once with the sync command and then opened read-only by
+the API, so ayah lookups never touch the network on the hot path:
+
+    python -m data.quran_corpus sync                 # from api.quran.com
+    python -m data.quran_corpus import dump.json     # from a bundled dump
+    python -m data.quran_corpus export dump.json     # write a dump for bundling
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+DEFAULT_CORPUS_PATH = os.environ.get(
+    "QURAN_CORPUS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "quran_corpus.sqlite"),
+)
+TOTAL_AYAHS = 6236
+
+SCHEMA = """
+CREATE TABLE chapters (
+    id INTEGER PRIMARY KEY,
+    name_arabic TEXT NOT NULL,
+    name_simple TEXT NOT NULL,
+    verses_count INTEGER NOT NULL,
+    revelation_place TEXT
+);
+CREATE TABLE verses (
+    surah_id INTEGER NOT NULL,
+    ayah_number INTEGER NOT NULL,
+    text_imlaei TEXT NOT NULL,
+    PRIMARY KEY (surah_id, ayah_number)
+) WITHOUT ROWID;
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def clean_html_tags(text):
+    """إزالة علامات HTML من النص."""
+    clean_text = re.sub(r"<sup.*?</sup>", "", text)
+    clean_text = re.sub(r"<[^>]+>", "", clean_text)
+    return clean_text.strip()
+
+
+class QuranCorpus:
+    """Read-only access to the on-disk corpus with one connection per thread."""
+
+    def __init__(self, path=DEFAULT_CORPUS_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._chapters = None
+        self._chapters_by_id = None
+
+    @property
+    def available(self):
+        return os.path.exists(self.path)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # immutable=1 skips file locking entirely; the sync command always
+            # replaces the file atomically, so open handles keep a consistent copy
+            uri = f"file:{self.path}?mode=ro&immutable=1"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def _load_chapters(self):
+        if self._chapters is None:
+            rows = self._connection().execute(
+                "SELECT id, name_arabic, name_simple, verses_count, revelation_place "
+                "FROM chapters ORDER BY id"
+            ).fetchall()
+            chapters = [
+                {
+                    "id": row[0],
+                    "name_arabic": row[1],
+                    "name_simple": row[2],
+                    "verses_count": row[3],
+                    "revelation_place": row[4],
+                }
+                for row in rows
+            ]
+            self._chapters_by_id = {ch["id"]: ch for ch in chapters}
+            self._chapters = chapters
+        return self._chapters
+
+    def get_chapters(self):
+        """All chapters as dicts, ordered by id. Returns [] when the store is missing."""
+        if not self.available:
+            return []
+        return self._load_chapters()
+
+    def get_chapter(self, surah_id):
+        """Chapter metadata for one surah, or None."""
+        if not self.available:
+            return None
+        self._load_chapters()
+        return self._chapters_by_id.get(int(surah_id))
+
+    def get_ayah(self, surah_id, ayah_number):
+        """Return the text_imlaei of one ayah, or None when it is not in the store."""
+        if not self.available:
+            return None
+        try:
+            key = (int(surah_id), int(ayah_number))
+        except (TypeError, ValueError):
+            return None
+        row = self._connection().execute(
+            "SELECT text_imlaei FROM verses WHERE surah_id = ? AND ayah_number = ?", key
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_verses(self, surah_id):
+        """All verses of a surah in the same shape as the Quran.com verse objects."""
+        if not self.available:
+            return []
+        surah_id = int(surah_id)
+        rows = self._connection().execute(
+            "SELECT ayah_number, text_imlaei FROM verses WHERE surah_id = ? ORDER BY ayah_number",
+            (surah_id,),
+        ).fetchall()
+        return [
+            {
+                "verse_number": ayah_number,
+                "verse_key": f"{surah_id}:{ayah_number}",
+                "text_imlaei": text,
+            }
+            for ayah_number, text in rows
+        ]
+
+    def iter_ayahs(self):
+        """Yield (surah_id, ayah_number, text) for the whole mushaf in order."""
+        if not self.available:
+            return
+        yield from self._connection().execute(
+            "SELECT surah_id, ayah_number, text_imlaei FROM verses ORDER BY surah_id, ayah_number"
+        )
+
+
+# ------------- بناء قاعدة البيانات -------------
+def write_corpus(path, chapters, verses, source):
+    """
+    Write a fresh corpus file atomically.
+    `chapters` are Quran.com chapter dicts, `verses` are (surah_id, ayah_number, text) tuples.
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO chapters VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    ch["id"],
+                    ch["name_arabic"],
+                    ch.get("name_simple", f"Surah {ch['id']}"),
+                    ch.get("verses_count", 0),
+                    ch.get("revelation_place"),
+                )
+                for ch in chapters
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO verses VALUES (?, ?, ?)",
+            [(s, a, clean_html_tags(text)) for s, a, text in verses],
+        )
+        conn.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [("source", source), ("synced_at", str(int(time.time())))],
+        )
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, path)
+
+
+def fetch_from_api(api_base_url, timeout=30):
+    """Download all chapters and verses from Quran.com."""
+    import requests
+
+    session = requests.Session()
+    response = session.get(f"{api_base_url}/chapters", timeout=timeout)
+    response.raise_for_status()
+    chapters = response.json().get("chapters", [])
+
+    verses = []
+    for ch in chapters:
+        page = 1
+        while page:
+            response = session.get(
+                f"{api_base_url}/verses/by_chapter/{ch['id']}",
+                params={"fields": "text_imlaei", "per_page": 50, "page": page},
+                timeout=timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+            for verse in data.get("verses", []):
+                surah_id, ayah_number = verse["verse_key"].split(":")
+                verses.append((int(surah_id), int(ayah_number), verse.get("text_imlaei", "")))
+            page = (data.get("pagination") or {}).get("next_page")
+        print(f"📖 Surah {ch['id']}: {ch.get('verses_count')} ayahs")
+
+    return chapters, verses
+
+
+def load_dump(dump_path):
+    """Read a JSON dump produced by `export`."""
+    with open(dump_path, encoding="utf-8") as f:
+        dump = json.load(f)
+    verses = [(v["surah_id"], v["ayah_number"], v["text_imlaei"]) for v in dump["verses"]]
+    return dump["chapters"], verses
+
+
+def export_dump(corpus, dump_path):
+    """Write the store contents as a JSON dump that `import` can read back."""
+    dump = {
+        "chapters": corpus.get_chapters(),
+        "verses": [
+            {"surah_id": s, "ayah_number": a, "text_imlaei": text}
+            for s, a, text in corpus.iter_ayahs()
+        ],
+    }
+    with open(dump_path, "w", encoding="utf-8") as f:
+        json.dump(dump, f, ensure_ascii=False)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the local Quran corpus store")
+    parser.add_argument("--path", default=DEFAULT_CORPUS_PATH, help="corpus SQLite file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sync = sub.add_parser("sync", help="download the corpus from api.quran.com")
+    sync.add_argument("--api-url", default="https://api.quran.com/api/v4")
+    imp = sub.add_parser("import", help="build the corpus from a JSON dump")
+    imp.add_argument("dump")
+    exp = sub.add_parser("export", help="write the corpus as a JSON dump")
+    exp.add_argument("dump")
+
+    args = parser.parse_args(argv)
+    start = time.time()
+
+    if args.command == "export":
+        export_dump(QuranCorpus(args.path), args.dump)
+        print(f"✅ Exported corpus to {args.dump}")
+        return 0
+
+    if args.command == "sync":
+        chapters, verses = fetch_from_api(args.api_url)
+        source = args.api_url
+    else:
+        chapters, verses = load_dump(args.dump)
+        source = os.path.basename(args.dump)
+
+    write_corpus(args.path, chapters, verses, source)
+    print(f"✅ Wrote {len(chapters)} surahs / {len(verses)} ayahs to {args.path} in {time.time() - start:.1f}s")
+    if len(verses) != TOTAL_AYAHS:
+        print(f"⚠️ Expected {TOTAL_AYAHS} ayahs, got {len(verses)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
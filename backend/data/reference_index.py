@@ -0,0 +1,131 @@
+# Precomputed normalized-reference index for all ayahs
+"""
+Normalizes every ayah of the local corpus once at startup so the scoring path
+only does lookups.
+
+Tokens are interned into a shared vocabulary and each ayah is stored as a
+slice of one flat `array('I')` of token IDs, which keeps the whole mushaf at a
+few MB per worker.
+"""
+
+import sys
+from array import array
+from collections import namedtuple
+
+ReferenceEntry = namedtuple("ReferenceEntry", ["text", "tokens", "token_ids", "word_count"])
+
+
+def _key(surah_id, ayah_number):
+    # Ayah numbers never exceed 286, so this packs (surah, ayah) into one small int
+    return int(surah_id) * 1000 + int(ayah_number)
+
+
+class Vocabulary:
+    """Interned token <-> integer ID mapping shared by all references."""
+
+    def __init__(self):
+        self._ids = {}
+        self.tokens = []
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def add(self, token):
+        token_id = self._ids.get(token)
+        if token_id is None:
+            token_id = len(self.tokens)
+            token = sys.intern(token)
+            self._ids[token] = token_id
+            self.tokens.append(token)
+        return token_id
+
+    def lookup(self, token):
+        return self._ids.get(token)
+
+    def encode(self, tokens, extra=None):
+        """
+        Encode tokens without growing the vocabulary.
+        Unknown tokens get IDs past the end of the vocabulary; pass the same
+        `extra` dict for several calls to keep those IDs consistent between them.
+        """
+        if extra is None:
+            extra = {}
+        ids = array("I")
+        for token in tokens:
+            token_id = self._ids.get(token)
+            if token_id is None:
+                token_id = extra.get(token)
+                if token_id is None:
+                    token_id = len(self.tokens) + len(extra)
+                    extra[token] = token_id
+            ids.append(token_id)
+        return ids
+
+    def encode_pair(self, ref_tokens, ref_ids, hyp_tokens):
+        """
+        (reference IDs, hypothesis IDs) for aligning the two. Precomputed
+        reference IDs are reused when they are all in the vocabulary; an
+        unindexed reference (e.g. fetched from the API) is re-encoded together
+        with the hypothesis so their out-of-vocabulary words share one mapping.
+        """
+        size = len(self.tokens)
+        if all(token_id < size for token_id in ref_ids):
+            return ref_ids, self.encode(hyp_tokens)
+        extra = {}
+        return self.encode(ref_tokens, extra), self.encode(hyp_tokens, extra)
+
+
+class ReferenceIndex:
+    """(surah, ayah) -> normalized reference text, tokens, token IDs and word count."""
+
+    def __init__(self, vocabulary=None):
+        self.vocabulary = vocabulary or Vocabulary()
+        self._rows = {}
+        self._offsets = array("I", [0])
+        self._ids = array("I")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        surah_id, ayah_number = key
+        return _key(surah_id, ayah_number) in self._rows
+
+    def add(self, surah_id, ayah_number, normalized_text):
+        add = self.vocabulary.add
+        self._ids.extend(add(token) for token in normalized_text.split())
+        self._rows[_key(surah_id, ayah_number)] = len(self._offsets) - 1
+        self._offsets.append(len(self._ids))
+
+    def get(self, surah_id, ayah_number):
+        """Return a ReferenceEntry, or None when the ayah is not indexed."""
+        try:
+            row = self._rows.get(_key(surah_id, ayah_number))
+        except (TypeError, ValueError):
+            return None
+        if row is None:
+            return None
+        token_ids = self._ids[self._offsets[row]:self._offsets[row + 1]]
+        tokens = [self.vocabulary.tokens[i] for i in token_ids]
+        return ReferenceEntry(" ".join(tokens), tokens, token_ids, len(tokens))
+
+    def entry_for_text(self, normalized_text):
+        """Build an unindexed entry, e.g. for an ayah fetched from the API."""
+        tokens = normalized_text.split()
+        return ReferenceEntry(" ".join(tokens), tokens, self.vocabulary.encode(tokens), len(tokens))
+
+    def memory_bytes(self):
+        """Approximate size of the index payload (IDs, offsets and vocabulary strings)."""
+        return (
+            self._ids.itemsize * len(self._ids)
+            + self._offsets.itemsize * len(self._offsets)
+            + sum(sys.getsizeof(token) for token in self.vocabulary.tokens)
+        )
+
+    @classmethod
+    def from_corpus(cls, corpus, normalize):
+        """Build the index from a QuranCorpus using the given normalizer."""
+        index = cls()
+        for surah_id, ayah_number, text in corpus.iter_ayahs():
+            index.add(surah_id, ayah_number, normalize(text))
+        return index
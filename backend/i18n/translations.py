@@ -43,9 +43,15 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "missing_audio": "Audio file is required",
         "missing_surah": "Surah selection is required", 
         "missing_ayah": "Ayah number is required",
+        "ayah_not_identified": "Could not identify which ayah was recited",
+        "batch_too_large": "Too many recordings in one batch",
         "processing_error": "Error processing request",
         "api_connection_error": "Failed to connect to Quran API",
         "temporary_error": "Temporary service error. Please try again.",
+        "job_not_found": "Job not found or expired",
+        "session_not_found": "Streaming session not found or expired",
+        "stream_too_long": "Recitation stream too long. Maximum duration: {seconds} seconds",
+        "server_busy": "Server is busy. Please try again shortly.",
         
         # Server Messages
         "server_starting": "Server starting...",
@@ -119,9 +125,15 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "missing_audio": "الملف الصوتي مطلوب",
         "missing_surah": "اختيار السورة مطلوب",
         "missing_ayah": "رقم الآية مطلوب",
+        "ayah_not_identified": "تعذر التعرف على الآية المتلوة",
+        "batch_too_large": "عدد التسجيلات في الدفعة الواحدة كبير جداً",
         "processing_error": "خطأ في معالجة الطلب",
         "api_connection_error": "فشل في الاتصال بواجهة القرآن",
         "temporary_error": "خطأ مؤقت في الخدمة. يرجى المحاولة مرة أخرى.",
+        "job_not_found": "المهمة غير موجودة أو انتهت صلاحيتها",
+        "session_not_found": "جلسة البث غير موجودة أو انتهت صلاحيتها",
+        "stream_too_long": "التلاوة المباشرة طويلة جداً. المدة القصوى: {seconds} ثانية",
+        "server_busy": "الخادم مشغول حالياً. يرجى المحاولة بعد قليل.",
         
         # Server Messages
         "server_starting": "جاري بدء الخادم...",
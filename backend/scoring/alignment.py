@@ -0,0 +1,93 @@
+# Minimal-edit word alignment over integer token IDs
+"""
+One Levenshtein alignment between the reference and the hypothesis yields
+the WER, the per-word statuses of `word_analysis` and the HTML diff, so the
+three always agree. Tokens are compared as integer IDs (see
+data/reference_index.py) and each DP row is computed with NumPy, looping over
+the shorter sequence, which keeps whole-surah alignments fast.
+"""
+
+import numpy as np
+
+# Backtrace directions
+_DIAG, _UP, _LEFT = 0, 1, 2
+
+
+def _backtrace(a, b):
+    """
+    Levenshtein DP of `a` (rows) against `b` (columns).
+    Returns the alignment steps ("equal" / "replace" / "delete" / "insert"),
+    where delete consumes an element of `a` and insert an element of `b`.
+    Ties prefer a substitution over a deletion over an insertion.
+    """
+    n, m = len(a), len(b)
+    cols = np.arange(m + 1, dtype=np.int64)
+    prev = cols.copy()
+    dirs = np.empty((n, m + 1), dtype=np.uint8)
+    dirs[:, 0] = _UP
+    row = np.empty(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        diag = prev[:-1] + (b != a[i - 1])
+        up = prev[1:] + 1
+        row[0] = i
+        np.minimum(diag, up, out=row[1:])
+        # Insertions along the row: cur[j] = min_k(row[k] + j - k)
+        cur = np.minimum.accumulate(row - cols) + cols
+        dirs[i - 1, 1:] = np.where(cur[1:] == diag, _DIAG, np.where(cur[1:] == up, _UP, _LEFT))
+        prev = cur
+
+    steps = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        direction = dirs[i - 1, j] if i > 0 else _LEFT
+        if direction == _DIAG:
+            i, j = i - 1, j - 1
+            steps.append("equal" if a[i] == b[j] else "replace")
+        elif direction == _UP:
+            i -= 1
+            steps.append("delete")
+        else:
+            j -= 1
+            steps.append("insert")
+    steps.reverse()
+    return steps
+
+
+def align(ref_ids, hyp_ids):
+    """
+    Minimal-edit alignment of two token ID sequences as difflib-style opcodes
+    (tag, i1, i2, j1, j2). Consecutive steps of the same kind are grouped, so
+    runs of substitutions become a single "replace" block of equal length.
+    """
+    ref = np.asarray(ref_ids, dtype=np.int64)
+    hyp = np.asarray(hyp_ids, dtype=np.int64)
+
+    # Loop over the shorter sequence; deletions and insertions swap roles
+    if len(hyp) < len(ref):
+        steps = _backtrace(hyp, ref)
+        swap = {"delete": "insert", "insert": "delete"}
+        steps = [swap.get(step, step) for step in steps]
+    else:
+        steps = _backtrace(ref, hyp)
+
+    opcodes = []
+    i = j = 0
+    for step in steps:
+        di = 0 if step == "insert" else 1
+        dj = 0 if step == "delete" else 1
+        if opcodes and opcodes[-1][0] == step:
+            tag, i1, _, j1, _ = opcodes[-1]
+            opcodes[-1] = (tag, i1, i + di, j1, j + dj)
+        else:
+            opcodes.append((step, i, i + di, j, j + dj))
+        i, j = i + di, j + dj
+    return opcodes
+
+
+def align_words(ref_words, hyp_words):
+    """Align two word lists that have no precomputed IDs."""
+    ids = {}
+    ref_ids = [ids.setdefault(w, len(ids)) for w in ref_words]
+    hyp_ids = [ids.setdefault(w, len(ids)) for w in hyp_words]
+    return align(ref_ids, hyp_ids)
@@ -0,0 +1,107 @@
+# Per-ayah results for a multi-ayah recitation
+"""
+A range of ayahs is scored by aligning one hypothesis against the
+concatenated reference; this module splits that single alignment back into
+per-ayah opcodes so each ayah gets its own word_analysis, WER and word
+boundaries.
+"""
+
+from bisect import bisect_right
+
+from scoring.char_alignment import char_errors_from_opcodes
+from scoring.word_analysis import error_rate, word_analysis_from_opcodes
+
+
+def split_opcodes_by_ayah(opcodes, offsets):
+    """
+    `offsets` are the reference word offsets where each ayah starts, followed by
+    the total reference length. Returns one opcode list per ayah with reference
+    indices local to the ayah and hypothesis indices left global.
+    Insertions are attributed to the ayah of the preceding reference word.
+    """
+    per_ayah = [[] for _ in range(len(offsets) - 1)]
+
+    def ayah_of(ref_index):
+        return min(max(bisect_right(offsets, ref_index) - 1, 0), len(per_ayah) - 1)
+
+    for tag, i1, i2, j1, j2 in opcodes:
+        if i1 == i2:
+            k = ayah_of(i1 - 1) if i1 > 0 else 0
+            local = i1 - offsets[k]
+            per_ayah[k].append((tag, local, local, j1, j2))
+            continue
+
+        a = i1
+        while a < i2:
+            k = ayah_of(a)
+            b = min(i2, offsets[k + 1])
+            piece = tag
+            if tag == "equal":
+                jj1, jj2 = j1 + (a - i1), j1 + (b - i1)
+            elif tag == "delete":
+                jj1 = jj2 = j1
+            else:
+                # Spread the detected words of a replace block over the ayahs it spans
+                span = j2 - j1
+                jj1 = j1 + round((a - i1) * span / (i2 - i1))
+                jj2 = j1 + round((b - i1) * span / (i2 - i1))
+                if jj1 == jj2:
+                    piece = "delete"
+            per_ayah[k].append((piece, a - offsets[k], b - offsets[k], jj1, jj2))
+            a = b
+
+    return per_ayah
+
+
+def score_ayahs(opcodes, ayahs, hyp_words, char_analysis=False):
+    """
+    `ayahs` is a list of (ayah_number, reference_raw, tokens) in recitation order.
+    Returns per-ayah dicts with word_analysis, WER and reference/detected word boundaries.
+    With `char_analysis`, wrong words also carry letter/diacritic annotations.
+    """
+    offsets = [0]
+    for _, _, tokens in ayahs:
+        offsets.append(offsets[-1] + len(tokens))
+
+    results = []
+    for (ayah_number, reference_raw, tokens), ops in zip(ayahs, split_opcodes_by_ayah(opcodes, offsets)):
+        wer_score = error_rate(ops, len(tokens))
+        detected = [(j1, j2) for _, _, _, j1, j2 in ops if j2 > j1]
+        k = len(results)
+        results.append({
+            "ayah_number": ayah_number,
+            "reference_text": reference_raw,
+            "wer_score": wer_score,
+            "accuracy_percentage": round(max(0.0, 1 - wer_score) * 100, 1),
+            "word_analysis": word_analysis_from_opcodes(
+                ops, tokens, hyp_words,
+                char_errors_from_opcodes(ops, tokens, hyp_words) if char_analysis else None,
+            ),
+            "boundaries": {
+                "reference_words": [offsets[k], offsets[k + 1]],
+                "detected_words": (
+                    [min(j1 for j1, _ in detected), max(j2 for _, j2 in detected)] if detected else None
+                ),
+            },
+        })
+    return results
+
+
+def score_heard_ayahs(results):
+    """
+    For a recording that was cut short: the trailing ayahs without any detected
+    word were never heard, so they are marked `heard: False` and left out.
+    Returns (WER over the heard ayahs, number of heard ayahs).
+    """
+    heard = len(results)
+    while heard > 1 and results[heard - 1]["boundaries"]["detected_words"] is None:
+        heard -= 1
+    for result in results[heard:]:
+        result["heard"] = False
+
+    errors = words = 0
+    for result in results[:heard]:
+        start, end = result["boundaries"]["reference_words"]
+        errors += round(result["wer_score"] * (end - start))
+        words += end - start
+    return (errors / words if words else 1.0), heard
@@ -0,0 +1,72 @@
+# Letter / diacritic alignment inside mismatched words
+"""
+Second-stage alignment that only runs on the word pairs the word alignment
+marked as substituted, so its cost grows with the number of mistakes, not
+with the length of the ayah.
+
+Each word is split into graphemes (a base letter followed by its tashkeel).
+The base letters are aligned first, then the diacritics of matching letters
+are compared. Differences are returned as a compact string of
+`offset:code` annotations, offsets counting graphemes of the reference word:
+
+    h  same letter, different harakat / tashkeel
+    l  different letter
+    m  letter missing from the recitation
+    x  extra letter recited before this offset
+
+e.g. "1:h,3:l" - wrong harakah on the 2nd letter and a wrong 4th letter.
+"""
+
+import unicodedata
+
+from scoring.alignment import align_words
+
+HARAKAH = "h"
+LETTER = "l"
+MISSING = "m"
+EXTRA = "x"
+
+
+def split_graphemes(word):
+    """Split a word into (base letter, diacritics) pairs."""
+    graphemes = []
+    for ch in word:
+        if graphemes and unicodedata.combining(ch):
+            base, marks = graphemes[-1]
+            graphemes[-1] = (base, marks + ch)
+        else:
+            graphemes.append((ch, ""))
+    return graphemes
+
+
+def char_diff(ref_word, hyp_word):
+    """Compact `offset:code` annotations of how `hyp_word` differs from `ref_word`."""
+    ref = split_graphemes(ref_word)
+    hyp = split_graphemes(hyp_word)
+    annotations = []
+    for tag, i1, i2, j1, j2 in align_words([g[0] for g in ref], [g[0] for g in hyp]):
+        if tag == "equal":
+            for k in range(i2 - i1):
+                if ref[i1 + k][1] != hyp[j1 + k][1]:
+                    annotations.append(f"{i1 + k}:{HARAKAH}")
+        elif tag == "replace":
+            annotations.extend(f"{i}:{LETTER}" for i in range(i1, i2))
+        elif tag == "delete":
+            annotations.extend(f"{i}:{MISSING}" for i in range(i1, i2))
+        elif tag == "insert":
+            annotations.extend(f"{i1}:{EXTRA}" for _ in range(j2 - j1))
+    return ",".join(annotations)
+
+
+def char_errors_from_opcodes(opcodes, ref_words, hyp_words):
+    """
+    Letter-level annotations for every substituted word, keyed by reference word index.
+    Words of a replace block are paired in order.
+    """
+    errors = {}
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag != "replace":
+            continue
+        for k in range(min(i2 - i1, j2 - j1)):
+            errors[i1 + k] = char_diff(ref_words[i1 + k], hyp_words[j1 + k])
+    return errors
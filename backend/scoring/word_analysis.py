@@ -0,0 +1,78 @@
+# Word-level analysis from alignment opcodes
+"""
+Turns difflib-style opcodes ("equal", "replace", "insert", "delete" with
+i1:i2 reference and j1:j2 hypothesis spans) into the `word_analysis` objects
+returned by the API and into edit counts for WER.
+"""
+
+
+def word_analysis_from_opcodes(opcodes, ref_words, hyp_words, char_errors=None):
+    """
+    Structured word-by-word analysis for API consumption.
+    Returns list of word objects with text, status and type.
+    `char_errors` (reference word index -> annotations, see scoring/char_alignment.py)
+    adds a compact "chars" field to the wrong reference words.
+    """
+    analysis = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            # Correct words
+            for w in ref_words[i1:i2]:
+                analysis.append({"text": w, "status": "correct", "type": "reference"})
+        elif tag == "replace":
+            # Wrong words - show both reference and detected
+            for i in range(i1, i2):
+                entry = {"text": ref_words[i], "status": "wrong", "type": "reference"}
+                if char_errors and i in char_errors:
+                    entry["chars"] = char_errors[i]
+                analysis.append(entry)
+            for w in hyp_words[j1:j2]:
+                analysis.append({"text": w, "status": "wrong", "type": "detected"})
+        elif tag == "insert":
+            # Extra words (inserted by user)
+            for w in hyp_words[j1:j2]:
+                analysis.append({"text": w, "status": "insert", "type": "detected"})
+        elif tag == "delete":
+            # Missing words (should have been said)
+            for w in ref_words[i1:i2]:
+                analysis.append({"text": w, "status": "missing", "type": "reference"})
+    return analysis
+
+
+def count_errors(opcodes):
+    """Substitutions + deletions + insertions implied by the opcodes."""
+    errors = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag != "equal":
+            errors += max(i2 - i1, j2 - j1)
+    return errors
+
+
+def error_rate(opcodes, ref_len):
+    """WER for the given opcodes; an empty reference counts as fully wrong."""
+    if ref_len == 0:
+        return 1.0
+    return count_errors(opcodes) / ref_len
+
+
+def diff_html_from_opcodes(opcodes, ref_words, hyp_words):
+    """
+    تلوين كلمة-بكلمة من نفس الـ opcodes.
+    الكلمات المتطابقة تصبح باللون الأخضر، الكلمات المستبدلة بالأحمر،
+    الإدخالات بالبرتقالي، الحذوفات بخط مائل.
+    """
+    parts = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            for w in ref_words[i1:i2]:
+                parts.append(f"<span class='word correct'>{w}</span>")
+        elif tag == "replace":
+            for w in hyp_words[j1:j2]:
+                parts.append(f"<span class='word wrong'>{w}</span>")
+        elif tag == "insert":
+            for w in hyp_words[j1:j2]:
+                parts.append(f"<span class='word insert'>{w}</span>")
+        elif tag == "delete":
+            for w in ref_words[i1:i2]:
+                parts.append(f"<span class='word deleted'>{w}</span>")
+    return " ".join(parts)
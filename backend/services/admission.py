@@ -0,0 +1,138 @@
+# Admission control for the inference path
+"""
+Bounded admission queue in front of the evaluators. At most `max_concurrency`
+evaluations run at once and at most `max_queue` wait (first come, first
+served) for a slot. A request is turned away immediately, instead of queueing
+until the server timeout, when the queue is full or when its expected wait
+plus the typical run time (a moving average of recent evaluations) would
+exceed `latency_budget`. A request still waiting when it can no longer finish
+within the budget is rejected as well.
+
+Rejections carry a Retry-After estimate: the time the current backlog needs
+to drain.
+
+Background work (queued jobs) shares the same slots so the model is never
+oversubscribed, but it is never rejected: it waits in line as long as it
+takes. It counts towards the expected wait of the requests behind it, not
+towards `max_queue`.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+QUEUE_FULL = "queue_full"
+OVER_BUDGET = "over_budget"
+TIMED_OUT = "timed_out"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't be served within the latency budget."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"admission rejected ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency=2, max_queue=8, latency_budget=60.0, smoothing=0.2):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.latency_budget = latency_budget
+        self.smoothing = smoothing
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queue = deque()
+        self._background = 0        # background entries in _queue
+        # Moving average of how long an admitted evaluation runs; unknown until the first one finishes
+        self._service_time = None
+        self._admitted = 0
+        self._rejected = {QUEUE_FULL: 0, OVER_BUDGET: 0, TIMED_OUT: 0}
+
+    def _retry_after(self):
+        """Seconds until the running and queued requests have drained (at least 1)."""
+        backlog = self._active + len(self._queue)
+        return max(1, math.ceil(backlog / self.max_concurrency * (self._service_time or 1.0)))
+
+    def _reject(self, reason):
+        self._rejected[reason] += 1
+        raise AdmissionRejected(reason, self._retry_after())
+
+    def _acquire(self, background=False):
+        """Wait for a slot (caller holds no lock); returns the seconds spent queued."""
+        start = time.perf_counter()
+        with self._cond:
+            if self._active < self.max_concurrency and not self._queue:
+                self._active += 1
+                self._admitted += 1
+                return 0.0
+
+            deadline = None
+            if not background:
+                if len(self._queue) - self._background >= self.max_queue:
+                    self._reject(QUEUE_FULL)
+                service_time = self._service_time or 0.0
+                expected_wait = (len(self._queue) + 1) / self.max_concurrency * service_time
+                if expected_wait + service_time > self.latency_budget:
+                    self._reject(OVER_BUDGET)
+                deadline = start + self.latency_budget - service_time
+
+            ticket = object()
+            self._queue.append(ticket)
+            if background:
+                self._background += 1
+            try:
+                while self._queue[0] is not ticket or self._active >= self.max_concurrency:
+                    remaining = None if deadline is None else deadline - time.perf_counter()
+                    if remaining is not None and remaining <= 0:
+                        self._reject(TIMED_OUT)
+                    self._cond.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                if background:
+                    self._background -= 1
+                # The next request in line may be able to go now (or move up)
+                self._cond.notify_all()
+            self._active += 1
+            self._admitted += 1
+        return time.perf_counter() - start
+
+    def _release(self, run_time):
+        with self._cond:
+            self._active -= 1
+            if self._service_time is None:
+                self._service_time = run_time
+            else:
+                self._service_time += self.smoothing * (run_time - self._service_time)
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, background=False):
+        """
+        Hold an evaluation slot for the duration of the block; yields the queue
+        wait in seconds. Raises AdmissionRejected instead of waiting past the
+        budget, except for `background` work, which waits for as long as it takes.
+        """
+        wait = self._acquire(background)
+        start = time.perf_counter()
+        try:
+            yield wait
+        finally:
+            self._release(time.perf_counter() - start)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self._active,
+                "waiting": len(self._queue),
+                "waiting_background": self._background,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "latency_budget": self.latency_budget,
+                "avg_service_time": round(self._service_time, 3) if self._service_time is not None else None,
+                "admitted": self._admitted,
+                "rejected": dict(self._rejected),
+            }
@@ -0,0 +1,122 @@
+# Asynchronous recitation-check jobs
+"""
+In-process job queue for long-running evaluations.
+
+HTTP handlers only enqueue work and return a job ID; a bounded pool of
+inference threads (sized independently from the web server threads) runs the
+evaluations, and clients poll or subscribe for the result.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting for an inference worker."""
+
+
+class _Job:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def snapshot(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": round(self.created_at, 3),
+        }
+        if self.started_at is not None:
+            data["queue_wait"] = round(self.started_at - self.created_at, 2)
+        if self.finished_at is not None:
+            data["run_time"] = round(self.finished_at - self.started_at, 2)
+        if self.status == COMPLETED:
+            data["result"] = self.result
+        elif self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """
+    Runs `run(*args, **kwargs)` on a pool of `max_workers` inference threads.
+    At most `max_pending` jobs may be queued or running at once; finished jobs
+    are kept for `ttl` seconds so clients can fetch the result.
+    """
+
+    def __init__(self, run, max_workers=2, max_pending=32, ttl=600):
+        self.run = run
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._jobs = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, *args, **kwargs):
+        """Queue a job and return its ID. Raises JobQueueFull when the queue is at capacity."""
+        job = _Job()
+        with self._lock:
+            self._purge_expired()
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"{self._pending} jobs already pending")
+            self._pending += 1
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._execute, job, args, kwargs)
+        return job.id
+
+    def _execute(self, job, args, kwargs):
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = self.run(*args, **kwargs)
+            job.status = COMPLETED
+        except Exception as e:
+            print(f"❌ Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+            job.done.set()
+
+    def get(self, job_id):
+        """Current state of a job as a JSON-ready dict, or None if unknown/expired."""
+        job = self._jobs.get(job_id)
+        return job.snapshot() if job else None
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes (or `timeout` passes); returns its snapshot."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job.done.wait(timeout)
+        return job.snapshot()
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "tracked": len(self._jobs)}
@@ -0,0 +1,107 @@
+# Sampling profiler for single requests
+"""
+Samples Python stacks of the running threads at a fixed interval from a
+background thread (`sys._current_frames()`) and aggregates them into
+collapsed stacks ("root;caller;leaf count" per line), the input format of
+flamegraph.pl, speedscope and inferno.
+
+Native work (ffmpeg decoding, CTranslate2 inference, NumPy) is attributed to
+the Python frame that called into it. ASR runs in worker threads (window pool,
+batching scheduler), so every busy thread is sampled with its name as the
+root frame; threads idling in a wait/select are left out unless they are the
+profiled request thread. Concurrent requests show up too.
+"""
+
+import os
+import sys
+import threading
+import time
+
+# Leaf frames from these modules mean the thread is idle (waiting on a lock, queue or socket)
+IDLE_MODULES = ("threading.py", "queue.py", "selectors.py", "socket.py", "socketserver.py", "thread.py")
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, thread_ident=None):
+        self.interval = interval
+        self.thread_ident = thread_ident or threading.get_ident()
+        self.stacks = {}
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        start = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident != self.thread_ident and os.path.basename(frame.f_code.co_filename) in IDLE_MODULES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+        self.duration = time.perf_counter() - start
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        """Collapsed-stack text, heaviest stacks first."""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items(), key=lambda i: -i[1]))
+
+    def top_frames(self, limit=10):
+        """Leaf frames with the most samples, as (frame, samples)."""
+        leaves = {}
+        for stack, count in self.stacks.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            leaves[leaf] = leaves.get(leaf, 0) + count
+        return sorted(leaves.items(), key=lambda i: -i[1])[:limit]
+
+    def save(self, directory, request_id):
+        """Write `<request_id>.collapsed` into `directory` and return its path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{request_id}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return path
+
+
+def prune_profiles(directory, max_files=100, ttl=86400):
+    """Delete saved profiles older than `ttl` seconds, then the oldest beyond `max_files`."""
+    now = time.time()
+    try:
+        files = sorted(
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(directory) if entry.name.endswith(".collapsed")
+        )
+    except OSError:
+        return 0
+    excess = max(0, len(files) - max_files)
+    removed = 0
+    for i, (mtime, path) in enumerate(files):
+        if i >= excess and now - mtime <= ttl:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
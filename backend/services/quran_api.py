@@ -0,0 +1,155 @@
+# Shared HTTP client for api.quran.com
+"""
+One pooled keep-alive session for every upstream call, with connect/read
+timeouts, bounded retries with exponential backoff and a circuit breaker.
+Read timeouts are not retried: a slow upstream would otherwise hold the
+request for (retries + 1) x read_timeout before the call counts as a single
+breaker failure.
+
+After `failure_threshold` consecutive failures the breaker opens and calls
+fail immediately with `CircuitOpenError` (a RequestException, so existing
+`except requests.exceptions.RequestException` fallbacks keep working). After
+`reset_timeout` seconds a single probe request is let through; its outcome
+closes the breaker again or keeps it open for another period.
+
+The base URL is configurable, so the client can be pointed at a local stub
+server in benchmarks and tests.
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without contacting the upstream while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a request may be sent now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(f"Quran API circuit open, retrying in {retry_in:.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+class QuranApiClient:
+    def __init__(self, base_url="https://api.quran.com/api/v4", connect_timeout=3.05, read_timeout=5.0,
+                 retries=2, backoff_factor=0.3, pool_size=10, failure_threshold=5, reset_timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._short_circuited = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._last_error = None
+
+    def get_json(self, path, params=None):
+        """GET `base_url + path` and return the decoded JSON body."""
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            with self._lock:
+                self._short_circuited += 1
+            raise
+
+        start = time.monotonic()
+        try:
+            response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # Client errors (e.g. an unknown verse key) don't mean the upstream is unhealthy
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status is not None and 400 <= status < 500 and status != 429:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            self._record(time.monotonic() - start, e)
+            if isinstance(e, ValueError):
+                raise requests.exceptions.InvalidJSONError(str(e)) from e
+            raise
+
+        self.breaker.record_success()
+        self._record(time.monotonic() - start)
+        return data
+
+    def _record(self, latency, error=None):
+        with self._lock:
+            self._requests += 1
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+            if error is not None:
+                self._errors += 1
+                self._last_error = f"{type(error).__name__}: {error}"
+
+    def stats(self):
+        with self._lock:
+            return {
+                "base_url": self.base_url,
+                "circuit": self.breaker.state,
+                "requests": self._requests,
+                "errors": self._errors,
+                "short_circuited": self._short_circuited,
+                "avg_latency": round(self._latency_total / self._requests, 4) if self._requests else 0.0,
+                "max_latency": round(self._latency_max, 4),
+                "last_error": self._last_error,
+            }
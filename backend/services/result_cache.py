@@ -0,0 +1,196 @@
+# Content-addressed cache for transcriptions and evaluation results
+"""
+Caches work keyed by a hash of the uploaded audio bytes plus everything that
+influences the output (ayah, model, decode settings...).
+
+A bounded in-memory LRU sits in front of an optional on-disk tier, and
+identical requests that are in flight at the same time share one computation
+instead of racing each other. The disk tier is bounded too: entries older than
+`disk_ttl` expire, and beyond `disk_max_entries` the least recently used files
+are pruned (at startup and every few writes).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+HIT = "hit"
+MISS = "miss"
+SHARED = "shared"
+
+
+def hash_audio(data):
+    """Content hash of an uploaded audio file."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache:
+    """
+    LRU of JSON-serializable values with an optional directory-backed second tier.
+    Values are stored serialized, so every caller gets its own copy to mutate.
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None, disk_max_entries=4096, disk_ttl=7 * 86400):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self.disk_ttl = disk_ttl
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.prune_disk()
+
+    @staticmethod
+    def make_key(*parts):
+        return hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _expired(self, mtime, now):
+        return bool(self.disk_ttl) and now - mtime > self.disk_ttl
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            now = time.time()
+            if self._expired(os.path.getmtime(path), now):
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                payload = f.read()
+            # The modification time doubles as last use for pruning
+            os.utime(path, (now, now))
+            return payload
+        except OSError:
+            return None
+
+    def prune_disk(self):
+        """Remove expired entries, then the least recently used ones beyond disk_max_entries."""
+        if not self.disk_dir or not self._prune_lock.acquire(blocking=False):
+            return 0
+        try:
+            now = time.time()
+            files = []
+            for directory in os.scandir(self.disk_dir):
+                if not directory.is_dir():
+                    continue
+                for entry in os.scandir(directory.path):
+                    try:
+                        files.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        continue
+            files.sort()
+            excess = max(0, len(files) - self.disk_max_entries) if self.disk_max_entries else 0
+            removed = 0
+            for i, (mtime, path) in enumerate(files):
+                if i >= excess and not self._expired(mtime, now):
+                    break
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+            if removed:
+                print(f"🧹 Result cache: pruned {removed} of {len(files)} disk entries")
+            return removed
+        finally:
+            self._prune_lock.release()
+
+    def _disk_put(self, key, payload):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Result cache disk write failed: {e}")
+            return
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % max(1, self.disk_max_entries // 10) == 0
+        if prune:
+            self.prune_disk()
+
+    def _memory_put(self, key, payload):
+        # Caller holds self._lock
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute, cacheable=lambda value: True):
+        """
+        Return (value, status) where status is "hit", "shared" (joined an identical
+        in-flight computation) or "miss" (computed here).
+        Only values for which `cacheable(value)` is true are stored.
+        """
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(payload), HIT
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.shared += 1
+
+        if not owner:
+            return json.loads(future.result()), SHARED
+
+        try:
+            payload = self._disk_get(key)
+            if payload is not None:
+                with self._lock:
+                    self.hits += 1
+                    self._memory_put(key, payload)
+                future.set_result(payload)
+                return json.loads(payload), HIT
+
+            with self._lock:
+                self.misses += 1
+            value = compute()
+            payload = json.dumps(value, ensure_ascii=False).encode("utf-8")
+            if cacheable(value):
+                with self._lock:
+                    self._memory_put(key, payload)
+                self._disk_put(key, payload)
+            future.set_result(payload)
+            return value, MISS
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,184 @@
+# Streaming recitation sessions
+"""
+Incremental transcription while the user is still reciting.
+
+Audio arrives in chunks; every `step_s` seconds of new audio the session
+re-transcribes the rolling window that starts after the last confirmed word.
+Words that two consecutive passes agree on are confirmed (local agreement) and
+the window start moves past them, so by the time the user stops only the last
+window is left to transcribe.
+"""
+
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+
+import numpy as np
+
+from audio.decode import SAMPLE_RATE, decode_audio_bytes
+
+PCM_FORMATS = {"pcm_s16le": "<i2", "pcm_f32le": "<f4"}
+
+
+class StreamLimitExceeded(Exception):
+    """Raised when a session receives more audio than it is allowed to buffer."""
+
+
+class TooManySessions(Exception):
+    """Raised when the store already holds its maximum number of live sessions."""
+
+
+class StreamingSession:
+    """
+    One recitation stream.
+    `transcribe_words(audio)` returns [(word, end_seconds), ...] for a float32 array;
+    `normalize(word)` is used to compare words between passes.
+    Raw PCM chunks must be 16 kHz mono; any other `audio_format` is treated as
+    an encoded container (e.g. webm/opus from MediaRecorder) and re-decoded as it grows.
+    `admit()` is a context manager held around each partial transcription pass (e.g.
+    an admission slot); if it raises, the pass is skipped and the audio stays buffered.
+    """
+
+    def __init__(self, transcribe_words, normalize, audio_format="pcm_s16le",
+                 step_s=1.0, max_window_s=30, max_duration_s=120, admit=nullcontext, **context):
+        self.id = uuid.uuid4().hex
+        self.context = context
+        self.transcribe_words = transcribe_words
+        self.normalize = normalize
+        self.admit = admit
+        self.audio_format = audio_format
+        self.step_samples = int(step_s * SAMPLE_RATE)
+        self.max_window_samples = int(max_window_s * SAMPLE_RATE)
+        self.max_samples = int(max_duration_s * SAMPLE_RATE)
+        self.lock = threading.Lock()
+        self.last_activity = time.time()
+
+        self._audio = np.zeros(0, dtype=np.float32)
+        self._pcm_remainder = b""
+        self._encoded = bytearray()
+        self._offset = 0           # first sample not covered by a confirmed word
+        self._last_run = 0         # buffer length at the previous transcription pass
+        self.confirmed_words = []
+        self.pending_words = []
+        self.passes = 0
+        self.transcribe_time = 0.0
+
+    @property
+    def duration(self):
+        return len(self._audio) / SAMPLE_RATE
+
+    def _decode_chunk(self, data):
+        dtype = PCM_FORMATS.get(self.audio_format)
+        if dtype:
+            data = self._pcm_remainder + data
+            itemsize = np.dtype(dtype).itemsize
+            usable = len(data) - len(data) % itemsize
+            self._pcm_remainder = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype=dtype).astype(np.float32)
+            return samples / 32768.0 if dtype == "<i2" else samples
+
+        self._encoded.extend(data)
+        try:
+            decoded = decode_audio_bytes(bytes(self._encoded))
+        except Exception:
+            # A partial container may end mid-frame; wait for more data
+            return np.zeros(0, dtype=np.float32)
+        return decoded[len(self._audio):]
+
+    def feed(self, data):
+        """
+        Append an audio chunk and run a transcription pass if enough new audio arrived.
+        Exceptions from `admit()` propagate after the chunk has been buffered.
+        """
+        self.last_activity = time.time()
+        samples = self._decode_chunk(data)
+        if len(self._audio) + len(samples) > self.max_samples:
+            raise StreamLimitExceeded(f"stream longer than {self.max_samples // SAMPLE_RATE}s")
+        if len(samples):
+            self._audio = np.concatenate([self._audio, samples])
+
+        if len(self._audio) - self._last_run >= self.step_samples:
+            with self.admit():
+                self._update()
+
+    def _transcribe_window(self):
+        start = time.time()
+        words = self.transcribe_words(self._audio[self._offset:])
+        self.transcribe_time += time.time() - start
+        self.passes += 1
+        self._last_run = len(self._audio)
+        return [(word, end) for word, end in words if word]
+
+    def _update(self):
+        words = self._transcribe_window()
+        current = [self.normalize(word) for word, _ in words]
+        previous = [self.normalize(word) for word in self.pending_words]
+
+        agreed = 0
+        while agreed < min(len(current), len(previous)) and current[agreed] == previous[agreed]:
+            agreed += 1
+
+        # Never let the window grow past what the model can see in one pass
+        window = len(self._audio) - self._offset
+        if agreed == 0 and window >= self.max_window_samples - self.step_samples:
+            agreed = max(0, len(words) - 1)
+
+        if agreed:
+            self.confirmed_words.extend(word for word, _ in words[:agreed])
+            self._offset += int(words[agreed - 1][1] * SAMPLE_RATE)
+        self.pending_words = [word for word, _ in words[agreed:]]
+
+    def finish(self, data=b""):
+        """Transcribe whatever follows the last confirmed word and return the full hypothesis."""
+        if data:
+            samples = self._decode_chunk(data)
+            if len(samples):
+                self._audio = np.concatenate([self._audio, samples])
+        if len(self._audio) > self._offset:
+            tail = [word for word, _ in self._transcribe_window()]
+        else:
+            tail = []
+        return " ".join(self.confirmed_words + tail)
+
+
+class SessionStore:
+    """
+    Thread-safe registry of streaming sessions that expire after `ttl` idle seconds.
+    At most `max_sessions` live sessions are kept, since each one buffers its audio.
+    """
+
+    def __init__(self, ttl=120, max_sessions=32):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _expired(self, session):
+        return session.last_activity < time.time() - self.ttl
+
+    def add(self, session):
+        with self._lock:
+            for session_id in [sid for sid, s in self._sessions.items() if self._expired(s)]:
+                del self._sessions[session_id]
+            if len(self._sessions) >= self.max_sessions:
+                raise TooManySessions(f"{len(self._sessions)} streaming sessions already open")
+            self._sessions[session.id] = session
+        return session.id
+
+    def get(self, session_id):
+        """The live session with this id, or None (expired sessions are dropped)."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and self._expired(session):
+                del self._sessions[session_id]
+                return None
+            return session
+
+    def remove(self, session_id):
+        """Take the session out of the store; None if it is unknown or expired."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None and self._expired(session):
+            return None
+        return session
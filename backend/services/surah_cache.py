@@ -0,0 +1,123 @@
+# Stale-while-revalidate cache for slow upstream lists (e.g. the surah list)
+"""
+Serves the last good value while a single background thread refreshes it:
+
+* fresh (younger than `ttl`): returned as is;
+* stale: returned immediately and one background refresh is started;
+* empty (cold start): callers wait on one shared fetch (single-flight).
+
+Failed fetches are cached too: no new attempt is made until a backoff that
+doubles on every consecutive failure (up to `max_backoff`) has passed, so an
+unhealthy upstream is not hit by every request. The last good value is
+persisted to `disk_path` so a restart starts warm.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+
+class StaleWhileRevalidateCache:
+    def __init__(self, fetch, ttl=3600, backoff=5.0, max_backoff=300.0, disk_path=None, name="cache"):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.initial_backoff = backoff
+        self.max_backoff = max_backoff
+        self.disk_path = disk_path
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._value = None
+        self._fetched_at = 0.0
+        self._inflight = None
+        self._backoff = backoff
+        self._retry_at = 0.0
+        self._last_error = None
+        self._refreshes = 0
+        self._failures = 0
+        self._load_from_disk()
+
+    def get(self):
+        """
+        Return (value, error). `value` is None only when nothing was ever fetched
+        and the fetch failed or is backing off; `error` then describes why.
+        """
+        with self._lock:
+            now = time.time()
+            if self._value is not None:
+                if now - self._fetched_at >= self.ttl and self._inflight is None and now >= self._retry_at:
+                    self._inflight = Future()
+                    threading.Thread(target=self._refresh, args=(self._inflight,), daemon=True).start()
+                return self._value, None
+
+            if self._inflight is None:
+                if now < self._retry_at:
+                    return None, self._last_error
+                self._inflight = Future()
+                future, owner = self._inflight, True
+            else:
+                future, owner = self._inflight, False
+
+        if owner:
+            self._refresh(future)
+        future.result()
+        with self._lock:
+            return self._value, (None if self._value is not None else self._last_error)
+
+    def _refresh(self, future):
+        try:
+            value = self.fetch()
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+                self._last_error = str(e)
+                self._retry_at = time.time() + self._backoff
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+                self._inflight = None
+            print(f"⚠️ {self.name} refresh failed, next attempt in {self._retry_at - time.time():.0f}s: {e}")
+        else:
+            with self._lock:
+                self._value = value
+                self._fetched_at = time.time()
+                self._refreshes += 1
+                self._backoff = self.initial_backoff
+                self._retry_at = 0.0
+                self._last_error = None
+                self._inflight = None
+            self._save_to_disk(value)
+        future.set_result(None)
+
+    def _load_from_disk(self):
+        if not self.disk_path:
+            return
+        try:
+            with open(self.disk_path, encoding="utf-8") as f:
+                saved = json.load(f)
+            self._value = saved["value"]
+            self._fetched_at = saved["fetched_at"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _save_to_disk(self, value):
+        if not self.disk_path:
+            return
+        tmp_path = f"{self.disk_path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.disk_path)), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"value": value, "fetched_at": time.time()}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.disk_path)
+        except OSError as e:
+            print(f"⚠️ Could not persist {self.name}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "age": round(time.time() - self._fetched_at, 1) if self._value is not None else None,
+                "refreshing": self._inflight is not None,
+                "refreshes": self._refreshes,
+                "failures": self._failures,
+                "retry_in": round(max(0.0, self._retry_at - time.time()), 1),
+            }
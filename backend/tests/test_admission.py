@@ -0,0 +1,115 @@
+"""Admission control in front of the evaluators."""
+
+import threading
+import time
+
+import pytest
+
+from services.admission import OVER_BUDGET, QUEUE_FULL, TIMED_OUT, AdmissionController, AdmissionRejected
+
+
+def hold_slot(controller, release, entered=None, background=False):
+    """Start a thread that holds an admission slot until `release` is set."""
+    def run():
+        with controller.admit(background):
+            if entered is not None:
+                entered.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_queue_full():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, latency_budget=10)
+    release = threading.Event()
+    hold_slot(controller, release)
+    wait_for(lambda: controller.stats()["active"] == 1)
+    hold_slot(controller, release)
+    wait_for(lambda: controller.stats()["waiting"] == 1)
+
+    with pytest.raises(AdmissionRejected) as rejection:
+        with controller.admit():
+            pass
+    assert rejection.value.reason == QUEUE_FULL
+    assert rejection.value.retry_after >= 1
+    release.set()
+
+
+def test_over_budget():
+    controller = AdmissionController(max_concurrency=1, max_queue=8, latency_budget=1.0)
+    controller._service_time = 0.6
+    release = threading.Event()
+    hold_slot(controller, release)
+    wait_for(lambda: controller.stats()["active"] == 1)
+
+    # Expected wait 0.6 s + 0.6 s run time exceeds the 1 s budget
+    with pytest.raises(AdmissionRejected) as rejection:
+        with controller.admit():
+            pass
+    assert rejection.value.reason == OVER_BUDGET
+    release.set()
+
+
+def test_timed_out():
+    controller = AdmissionController(max_concurrency=1, max_queue=8, latency_budget=0.2)
+    release = threading.Event()
+    hold_slot(controller, release)
+    wait_for(lambda: controller.stats()["active"] == 1)
+
+    start = time.monotonic()
+    with pytest.raises(AdmissionRejected) as rejection:
+        with controller.admit():
+            pass
+    assert rejection.value.reason == TIMED_OUT
+    assert time.monotonic() - start < 1.0
+    assert controller.stats()["rejected"][TIMED_OUT] == 1
+    release.set()
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    controller = AdmissionController(max_concurrency=1, max_queue=8, latency_budget=10)
+    release = threading.Event()
+    hold_slot(controller, release)
+    wait_for(lambda: controller.stats()["active"] == 1)
+
+    order = []
+
+    def waiter(i):
+        with controller.admit():
+            order.append(i)
+
+    threads = []
+    for i in range(4):
+        threads.append(threading.Thread(target=waiter, args=(i,), daemon=True))
+        threads[-1].start()
+        wait_for(lambda: controller.stats()["waiting"] == i + 1)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert order == [0, 1, 2, 3]
+
+
+def test_background_work_waits_without_rejection():
+    controller = AdmissionController(max_concurrency=1, max_queue=0, latency_budget=0.05)
+    release = threading.Event()
+    hold_slot(controller, release)
+    wait_for(lambda: controller.stats()["active"] == 1)
+
+    entered = threading.Event()
+    hold_slot(controller, threading.Event(), entered, background=True)
+    wait_for(lambda: controller.stats()["waiting_background"] == 1)
+    # Well past the budget the background entry is still waiting, not rejected
+    time.sleep(0.1)
+    assert controller.stats()["rejected"][TIMED_OUT] == 0
+
+    release.set()
+    assert entered.wait(2)
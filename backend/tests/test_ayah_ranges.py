@@ -0,0 +1,31 @@
+"""Per-ayah scoring of range recitations."""
+
+from scoring.alignment import align_words
+from scoring.ayah_ranges import score_ayahs, score_heard_ayahs
+
+AYAHS = [
+    (1, "قل هو الله أحد", "قل هو الله أحد".split()),
+    (2, "الله الصمد", "الله الصمد".split()),
+    (3, "لم يلد ولم يولد", "لم يلد ولم يولد".split()),
+]
+
+
+def score(hypothesis):
+    ref_words = [token for _, _, tokens in AYAHS for token in tokens]
+    hyp_words = hypothesis.split()
+    return score_ayahs(align_words(ref_words, hyp_words), AYAHS, hyp_words)
+
+
+def test_truncated_recording_leaves_unheard_ayahs_out():
+    results = score("قل هو الله أحد الله الصمد")
+
+    wer_score, heard = score_heard_ayahs(results)
+
+    assert (wer_score, heard) == (0.0, 2)
+    assert results[2]["heard"] is False
+    assert "heard" not in results[1]
+
+
+def test_errors_in_heard_ayahs_still_count():
+    wer_score, heard = score_heard_ayahs(score("قل هو الله الله الصمد"))
+    assert (wer_score, heard) == (1 / 6, 2)
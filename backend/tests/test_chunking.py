@@ -0,0 +1,18 @@
+"""Splitting long recitations into model-sized windows."""
+
+import numpy as np
+
+from audio.chunking import SAMPLE_RATE, split_at_silence
+
+
+def test_ties_cut_at_the_latest_quiet_frame():
+    # 95 s of tone with an exact-zero gap every 5 s: every candidate gap is equally quiet
+    samples = np.full(95 * SAMPLE_RATE, 0.1, dtype=np.float32)
+    for second in range(5, 95, 5):
+        samples[second * SAMPLE_RATE: second * SAMPLE_RATE + SAMPLE_RATE // 10] = 0.0
+
+    windows = split_at_silence(samples)
+
+    assert len(windows) == 4
+    assert all(len(w) <= 30 * SAMPLE_RATE for w in windows)
+    assert sum(len(w) for w in windows) == len(samples)
@@ -0,0 +1,79 @@
+"""Model lifecycle states behind /api/ready."""
+
+import os
+
+import pytest
+
+from asr.warmup import run_warmup
+
+os.environ.setdefault("ASR_PRELOAD", "0")
+
+
+def test_run_warmup_continues_previous_rounds():
+    first = run_warmup([("step", lambda: None)], max_rounds=1)
+    assert (first["rounds"], first["settled"]) == (1, False)
+
+    second = run_warmup([("step", lambda: None)], max_rounds=1, previous=first)
+    assert second["rounds"] == 2
+    assert len(second["latencies"]["step"]) == 2
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "ASR_WARMUP_RETRY_ROUNDS", 3)
+    monkeypatch.setattr(app, "model_status", dict(
+        app.model_status, state="degraded", degraded_reason="warmup latencies did not settle within 3 rounds",
+        warmup={"rounds": 3, "settled": False, "latencies": {}, "total_time": 1.0},
+    ))
+    return app
+
+
+def fake_warmups(app, monkeypatch, outcomes):
+    """warm_up_model stand-in returning (or raising) `outcomes` in order."""
+    calls = iter(outcomes)
+
+    def warm_up_model(model, previous=None, max_rounds=1):
+        outcome = next(calls)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return {"rounds": (previous or {"rounds": 0})["rounds"] + 1, "settled": outcome,
+                "latencies": {}, "total_time": 1.0}
+
+    monkeypatch.setattr(app, "warm_up_model", warm_up_model)
+
+
+def ready_status(app):
+    return app.app.test_client().get("/api/ready").status_code
+
+
+def test_degraded_model_becomes_ready_once_warmup_settles(app_module, monkeypatch):
+    fake_warmups(app_module, monkeypatch, [False, True])
+    assert ready_status(app_module) == 503
+
+    app_module.settle_warmup(object())
+
+    assert app_module.model_status["state"] == "ready"
+    assert app_module.model_status["degraded_reason"] is None
+    assert app_module.model_status["warmup"]["rounds"] == 5
+    assert ready_status(app_module) == 200
+
+
+def test_noisy_warmup_is_promoted_after_retry_rounds(app_module, monkeypatch):
+    fake_warmups(app_module, monkeypatch, [False, False, False])
+
+    app_module.settle_warmup(object())
+
+    assert app_module.model_status["state"] == "ready"
+    assert app_module.model_status["warmup"]["settled"] is False
+
+
+def test_failing_warmup_stays_degraded(app_module, monkeypatch):
+    fake_warmups(app_module, monkeypatch, [False, RuntimeError("boom"), RuntimeError("boom")])
+
+    app_module.settle_warmup(object())
+
+    assert app_module.model_status["state"] == "degraded"
+    assert app_module.model_status["degraded_reason"] == "warmup failed: boom"
+    assert ready_status(app_module) == 503
@@ -0,0 +1,49 @@
+"""Ayah identification with the n-gram index."""
+
+from data.ngram_index import NgramIndex, build_index
+from data.normalize import normalize_text_for_compare
+from data.quran_corpus import QuranCorpus, write_corpus
+
+CHAPTERS = [{"id": 112, "name_arabic": "الإخلاص", "verses_count": 4}]
+VERSES = [
+    (112, 1, "قُلْ هُوَ اللَّهُ أَحَدٌ"),
+    (112, 2, "اللَّهُ الصَّمَدُ"),
+    (112, 3, "لَمْ يَلِدْ وَلَمْ يُولَدْ"),
+    (112, 4, "وَلَمْ يَكُن لَّهُ كُفُوًا أَحَدٌ"),
+]
+
+
+def build(tmp_path):
+    corpus_path = str(tmp_path / "quran.sqlite3")
+    write_corpus(corpus_path, CHAPTERS, VERSES, "test")
+    index_path = str(tmp_path / "ngram_index")
+    build_index(QuranCorpus(corpus_path), index_path)
+    return NgramIndex(index_path)
+
+
+def words(text):
+    return normalize_text_for_compare(text).split()
+
+
+def test_lookup_long_hypothesis(tmp_path):
+    index = build(tmp_path)
+    best = index.lookup(words("قُلْ هُوَ اللَّهُ أَحَدٌ"))[0]
+    assert (best["surah_id"], best["ayah_start"], best["ayah_end"]) == (112, 1, 1)
+
+
+def test_lookup_hypothesis_shorter_than_ngram(tmp_path):
+    index = build(tmp_path)
+    assert index.lookup(words("اللَّهُ الصَّمَدُ")) == [
+        {"surah_id": 112, "ayah_start": 2, "ayah_end": 2, "score": 1.0}
+    ]
+    assert index.lookup(words("الصَّمَدُ")) == []
+
+
+def test_lookup_ignores_spans_below_min_score(tmp_path):
+    index = build(tmp_path)
+    # One 3-gram of 112:1 inside an otherwise unrelated recitation
+    hypothesis = words("قُلْ هُوَ اللَّهُ") + [f"كلمة{i}" for i in range(30)]
+
+    assert index.lookup(hypothesis)[0]["score"] < 0.05
+    assert index.lookup(hypothesis, min_score=0.2) == []
+    assert index.lookup(words("قُلْ هُوَ اللَّهُ أَحَدٌ"), min_score=0.2)[0]["ayah_start"] == 1
@@ -0,0 +1,40 @@
+"""Operator-only request profiling."""
+
+import os
+import time
+
+from services.profiler import prune_profiles
+
+os.environ.setdefault("ASR_PRELOAD", "0")
+
+
+def test_prune_profiles_expires_and_caps(tmp_path):
+    now = time.time()
+    for i, age in enumerate([10 * 86400, 30, 20, 10]):
+        path = tmp_path / f"p{i}.collapsed"
+        path.write_text("main 1\n")
+        os.utime(path, (now - age, now - age))
+
+    assert prune_profiles(str(tmp_path), max_files=2, ttl=86400) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["p2.collapsed", "p3.collapsed"]
+
+
+def test_profiles_need_the_token_and_get_unique_ids(tmp_path, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(app, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(app, "PROFILE_DIR", str(tmp_path))
+
+    ids = []
+    for _ in range(2):
+        with app.app.test_request_context("/", headers={"X-Profile": "1", "X-Request-ID": "same"}):
+            assert not app.profile_requested()
+        with app.app.test_request_context("/", headers={"X-Profile": "secret", "X-Request-ID": "same"}):
+            assert app.profile_requested()
+            ids.append(app.run_profiled(lambda: {})["profile"]["request_id"])
+    assert ids[0] != ids[1] and all(i.startswith("same-") for i in ids)
+
+    client = app.app.test_client()
+    assert client.get(f"/api/profiles/{ids[0]}", headers={"X-Profile": "1"}).status_code == 404
+    assert client.get(f"/api/profiles/{ids[0]}", headers={"X-Profile": "secret"}).status_code == 200
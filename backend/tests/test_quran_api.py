@@ -0,0 +1,60 @@
+"""Quran API client against the local stub server."""
+
+import time
+
+import pytest
+import requests
+
+from benchmarks.stub_quran_api import StubQuranApi
+from services.quran_api import CLOSED, OPEN, CircuitOpenError, QuranApiClient
+
+VERSE = "/verses/by_key/112:1"
+
+
+def test_retries_server_errors():
+    with StubQuranApi() as stub:
+        client = QuranApiClient(stub.base_url, retries=2, backoff_factor=0)
+        stub.fail(2)
+
+        assert client.get_json(VERSE)["verse"]["verse_key"] == "112:1"
+        assert stub.requests == 3
+        assert client.breaker.state == CLOSED
+
+
+def test_read_timeouts_are_not_retried():
+    with StubQuranApi(latency_ms=300) as stub:
+        client = QuranApiClient(stub.base_url, read_timeout=0.05, retries=2, backoff_factor=0)
+
+        start = time.monotonic()
+        with pytest.raises(requests.exceptions.RequestException, match="Read timed out"):
+            client.get_json(VERSE)
+        assert stub.requests == 1
+        assert time.monotonic() - start < 0.3
+
+
+def test_breaker_opens_probes_and_closes():
+    with StubQuranApi() as stub:
+        client = QuranApiClient(stub.base_url, retries=0, failure_threshold=2, reset_timeout=0.2)
+        stub.fail(2)
+        for _ in range(2):
+            with pytest.raises(requests.exceptions.HTTPError):
+                client.get_json(VERSE)
+        assert client.breaker.state == OPEN
+
+        # Open: fails fast without contacting the upstream
+        with pytest.raises(CircuitOpenError):
+            client.get_json(VERSE)
+        assert stub.requests == 2
+
+        # Half-open after the reset timeout: a failed probe opens it again
+        time.sleep(0.25)
+        stub.fail(1)
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.get_json(VERSE)
+        assert client.breaker.state == OPEN
+
+        # A successful probe closes it
+        time.sleep(0.25)
+        assert client.get_json(VERSE)["verse"]["verse_number"] == 1
+        assert client.breaker.state == CLOSED
+        assert client.stats()["short_circuited"] == 1
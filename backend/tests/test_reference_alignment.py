@@ -0,0 +1,48 @@
+"""Scoring against references that are not in the index (no corpus / API fallback)."""
+
+import os
+
+from data.reference_index import ReferenceIndex
+from scoring.alignment import align
+from scoring.word_analysis import error_rate
+
+os.environ.setdefault("ASR_PRELOAD", "0")
+
+REFERENCE = "بسم الله الرحمن الرحيم"
+HYPOTHESIS = "قل هو الله أحد"
+# Shares one word with REFERENCE at the same position
+PARTIAL_HYPOTHESIS = "قل الله هو أحد"
+
+
+def test_unindexed_reference_against_different_hypothesis():
+    index = ReferenceIndex()
+    index.add(112, 1, "الله")
+    entry = index.entry_for_text(REFERENCE)
+    hyp_words = HYPOTHESIS.split()
+
+    ref_ids, hyp_ids = index.vocabulary.encode_pair(entry.tokens, entry.token_ids, hyp_words)
+    opcodes = align(ref_ids, hyp_ids)
+
+    assert opcodes != [("equal", 0, 4, 0, 4)]
+    assert error_rate(opcodes, entry.word_count) == 1.0
+
+
+def test_indexed_reference_keeps_precomputed_ids():
+    index = ReferenceIndex()
+    index.add(1, 1, REFERENCE)
+    entry = index.get(1, 1)
+
+    ref_ids, _ = index.vocabulary.encode_pair(entry.tokens, entry.token_ids, HYPOTHESIS.split())
+
+    assert ref_ids is entry.token_ids
+
+
+def test_score_hypothesis_with_unindexed_reference():
+    import app
+
+    reference = app.reference_index.entry_for_text(REFERENCE)
+    assert app.score_hypothesis(HYPOTHESIS, reference)["wer_score"] == 1.0
+
+    scores = app.score_hypothesis(PARTIAL_HYPOTHESIS, reference)
+    assert scores["wer_score"] == 0.75
+    assert [word["status"] for word in scores["word_analysis"]].count("correct") == 1
@@ -0,0 +1,29 @@
+"""Limits of the streaming session store."""
+
+import pytest
+
+from services.streaming import SessionStore, StreamingSession, TooManySessions
+
+
+def session():
+    return StreamingSession(lambda audio: [], str)
+
+
+def test_store_refuses_sessions_past_the_cap():
+    store = SessionStore(ttl=120, max_sessions=2)
+    store.add(session())
+    store.add(session())
+    with pytest.raises(TooManySessions):
+        store.add(session())
+
+
+def test_expired_sessions_are_not_returned():
+    store = SessionStore(ttl=120, max_sessions=1)
+    expired = session()
+    store.add(expired)
+    expired.last_activity -= 121
+
+    assert store.get(expired.id) is None
+    assert store.remove(expired.id) is None
+    # The expired session no longer holds a slot
+    store.add(session())